@@ -7,10 +7,13 @@
 """
 
 from pathlib import Path
-from huggingface_hub import hf_hub_download, list_repo_files
+from download_pdf_data import (
+    DOWNLOAD_WORKERS, configure_hf_transfer, configure_http_session, download_pdf_data
+)
+from huggingface_hub import HfApi
 from datasets import load_dataset
-import csv
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 class Colors:
     RED = '\033[31m'
@@ -36,101 +39,68 @@ ALL_SPLITS = [
     "An_Introduction_to_Xi_Jinping_Thought_on_Socialism_with_Chinese_Characteristics_for_a_New_Era"
 ]
 
+# 小于该大小的CSV视为无效（至少应包含表头和一行数据）
+MIN_CSV_BYTES = 32
 
-def download_pdf_data(output_dir: Path, repo_id: str):
-    """从Hugging Face Hub下载PDF数据"""
 
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
-    print(f"{Colors.BLUE}Downloading PDF Data{Colors.RESET}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
-    print(f"Repository: {repo_id}")
-    print(f"Output directory: {output_dir}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
+def is_local_split_current(split_name: str, qa_data_dir: Path, revision: str = None,
+                           verbose: bool = False) -> bool:
+    """检查本地CSV是否有效且与数据集版本一致
 
-    # 创建输出目录
-    output_dir.mkdir(parents=True, exist_ok=True)
+    revision 为数据集仓库当前的commit SHA，记录在CSV旁的 .etag 文件中，
+    本地文件对应的版本与之一致时无需重新下载；verbose 为 True 时打印跳过信息
+    """
+    csv_file = qa_data_dir / f"{split_name}.csv"
+    etag_file = qa_data_dir / f"{split_name}.etag"
 
+    if not csv_file.exists():
+        return False
+
+    # 只检查大小和表头，不扫描整个文件
     try:
-        # 列出仓库中的所有文件
-        print(f"{Colors.YELLOW}Fetching file list from repository...{Colors.RESET}")
-        files = list_repo_files(repo_id=repo_id, repo_type=REPO_TYPE)
+        file_size = csv_file.stat().st_size
+        if file_size < MIN_CSV_BYTES:
+            raise ValueError(f"too small ({file_size} bytes)")
+        with open(csv_file, 'rb') as f:
+            if not f.readline().strip():
+                raise ValueError("missing header")
+
+        local_revision = etag_file.read_text().strip() if etag_file.exists() else None
+        if revision and local_revision != revision:
+            print(f"{Colors.YELLOW}  {split_name}: dataset has been updated, re-downloading...{Colors.RESET}")
+            return False
+    except Exception as e:
+        print(f"{Colors.YELLOW}  {split_name}: file exists but is invalid ({e}), re-downloading...{Colors.RESET}")
+        return False
 
-        # 过滤出PDF文件
-        pdf_files = [f for f in files if f.endswith('.pdf')]
+    if verbose:
+        print(f"{Colors.GREEN}✓ Already exists: {csv_file} ({file_size:,} bytes){Colors.RESET}")
+    return True
 
-        if not pdf_files:
-            print(f"{Colors.YELLOW}No PDF files found in repository{Colors.RESET}")
-            return False
 
-        print(f"{Colors.GREEN}✓ Found {len(pdf_files)} PDF files{Colors.RESET}\n")
-
-        # 下载每个PDF文件
-        success_count = 0
-        for pdf_file in pdf_files:
-            # 检查文件是否已存在
-            local_path = output_dir / pdf_file
-
-            if local_path.exists():
-                print(f"{Colors.CYAN}Checking {pdf_file}...{Colors.RESET}")
-                file_size = local_path.stat().st_size
-                if file_size > 0:
-                    print(f"{Colors.GREEN}✓ Already exists: {local_path} ({file_size:,} bytes){Colors.RESET}")
-                    success_count += 1
-                    continue
-                else:
-                    print(f"{Colors.YELLOW}  File exists but is empty, re-downloading...{Colors.RESET}")
-
-            print(f"{Colors.YELLOW}Downloading {pdf_file}...{Colors.RESET}")
-
-            try:
-                # 下载文件
-                downloaded_path = hf_hub_download(
-                    repo_id=repo_id,
-                    repo_type=REPO_TYPE,
-                    filename=pdf_file,
-                    local_dir=output_dir,
-                    local_dir_use_symlinks=False
-                )
-
-                file_size = Path(downloaded_path).stat().st_size
-                print(f"{Colors.GREEN}✓ Downloaded {pdf_file} ({file_size:,} bytes){Colors.RESET}")
-                success_count += 1
-
-            except Exception as e:
-                print(f"{Colors.RED}✗ Failed to download {pdf_file}: {e}{Colors.RESET}")
-
-        # 下载README（如果存在）
-        if "README.md" in files:
-            print(f"\n{Colors.YELLOW}Downloading README.md...{Colors.RESET}")
-            try:
-                readme_path = hf_hub_download(
-                    repo_id=repo_id,
-                    repo_type=REPO_TYPE,
-                    filename="README.md",
-                    local_dir=output_dir,
-                    local_dir_use_symlinks=False
-                )
-                print(f"{Colors.GREEN}✓ Downloaded README.md{Colors.RESET}")
-            except Exception as e:
-                print(f"{Colors.YELLOW}⚠ Failed to download README.md: {e}{Colors.RESET}")
-
-        # 总结
-        print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
-        print(f"{Colors.BLUE}PDF Download Summary{Colors.RESET}")
-        print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
-        print(f"Successfully downloaded: {success_count}/{len(pdf_files)} files")
-        print(f"Output directory: {output_dir}")
-        print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
-
-        return success_count == len(pdf_files)
+def export_split(dataset, split_name: str, qa_data_dir: Path, revision: str = None):
+    """把已加载的split保存为CSV，返回 (split名称, CSV路径, 是否成功)"""
+    csv_file = qa_data_dir / f"{split_name}.csv"
+    try:
+        # 直接从Arrow表批量写出，不逐行转换为Python dict
+        dataset.to_csv(str(csv_file), index=False, encoding='utf-8')
+        if revision:
+            (qa_data_dir / f"{split_name}.etag").write_text(revision)
+
+        print(f"{Colors.GREEN}✓ Downloaded {len(dataset)} questions to {csv_file}{Colors.RESET}")
+        return split_name, csv_file, True
 
     except Exception as e:
-        print(f"{Colors.RED}✗ Error: {e}{Colors.RESET}")
-        return False
+        print(f"{Colors.RED}✗ Failed to save {split_name}: {e}{Colors.RESET}")
+        return split_name, csv_file, False
+
 
+def download_qa_datasets(qa_data_dir: Path, splits: list, repo_id: str, verbose: bool = False):
+    """下载QA数据集到本地QA_data目录
 
-def download_qa_datasets(qa_data_dir: Path, splits: list, repo_id: str):
-    """下载QA数据集到本地QA_data目录"""
+    load_dataset 会在同一个文件锁下准备整个数据集的所有split，因此只加载一次DatasetDict，
+    再并行把需要更新的split导出为CSV（各split写入不同的文件，互不影响）
+    """
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}Downloading QA Datasets{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
@@ -140,52 +110,46 @@ def download_qa_datasets(qa_data_dir: Path, splits: list, repo_id: str):
 
     qa_data_dir.mkdir(parents=True, exist_ok=True)
 
-    downloaded_files = {}
-    success_count = 0
+    # 获取数据集仓库当前的commit SHA，用于判断本地CSV是否过期
+    try:
+        revision = HfApi().dataset_info(repo_id).sha
+    except Exception as e:
+        print(f"{Colors.YELLOW}⚠ Failed to fetch dataset revision ({e}), reusing existing files{Colors.RESET}")
+        revision = None
 
+    downloaded_files = {}
+    splits_to_fetch = []
     for split_name in splits:
-        csv_file = qa_data_dir / f"{split_name}.csv"
-
-        # 检查文件是否已存在
-        if csv_file.exists():
-            print(f"\n{Colors.CYAN}Checking {split_name}...{Colors.RESET}")
-            try:
-                # 验证文件是否有效
-                with open(csv_file, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    row_count = sum(1 for _ in reader)
-
-                if row_count > 0:
-                    downloaded_files[split_name] = csv_file
-                    print(f"{Colors.GREEN}✓ Already exists: {csv_file} ({row_count} questions){Colors.RESET}")
-                    success_count += 1
-                    continue
-                else:
-                    print(f"{Colors.YELLOW}  File exists but is empty, re-downloading...{Colors.RESET}")
-            except Exception as e:
-                print(f"{Colors.YELLOW}  File exists but is invalid ({e}), re-downloading...{Colors.RESET}")
-
-        # 下载数据集
-        print(f"\n{Colors.YELLOW}Downloading {split_name}...{Colors.RESET}")
+        if is_local_split_current(split_name, qa_data_dir, revision, verbose):
+            downloaded_files[split_name] = qa_data_dir / f"{split_name}.csv"
+        else:
+            splits_to_fetch.append(split_name)
+
+    if splits_to_fetch:
+        if verbose:
+            print(f"{Colors.YELLOW}Downloading {', '.join(splits_to_fetch)}...{Colors.RESET}")
         try:
-            dataset = load_dataset(repo_id, split=split_name)
-
-            # 保存为CSV
-            with open(csv_file, 'w', encoding='utf-8', newline='') as f:
-                if len(dataset) > 0:
-                    fieldnames = list(dataset[0].keys())
-                    writer = csv.DictWriter(f, fieldnames=fieldnames)
-                    writer.writeheader()
-
-                    for row in dataset:
-                        writer.writerow(row)
-
-            downloaded_files[split_name] = csv_file
-            print(f"{Colors.GREEN}✓ Downloaded {len(dataset)} questions to {csv_file}{Colors.RESET}")
-            success_count += 1
-
+            dataset_dict = load_dataset(repo_id, revision=revision, download_mode="reuse_dataset_if_exists")
         except Exception as e:
-            print(f"{Colors.RED}✗ Failed to download {split_name}: {e}{Colors.RESET}")
+            print(f"{Colors.RED}✗ Failed to download {repo_id}: {e}{Colors.RESET}")
+            dataset_dict = None
+
+        if dataset_dict is not None:
+            missing_splits = [s for s in splits_to_fetch if s not in dataset_dict]
+            for split_name in missing_splits:
+                print(f"{Colors.RED}✗ Split not found in {repo_id}: {split_name}{Colors.RESET}")
+
+            with ThreadPoolExecutor(max_workers=len(splits_to_fetch)) as executor:
+                futures = [
+                    executor.submit(export_split, dataset_dict[split_name], split_name, qa_data_dir, revision)
+                    for split_name in splits_to_fetch if split_name not in missing_splits
+                ]
+                for future in as_completed(futures):
+                    split_name, csv_file, ok = future.result()
+                    if ok:
+                        downloaded_files[split_name] = csv_file
+
+    success_count = len(downloaded_files)
 
     # 总结
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
@@ -225,9 +189,31 @@ def main():
         nargs="+",
         help=f"QA dataset splits to download (default: all). Available: {', '.join(ALL_SPLITS)}"
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=DOWNLOAD_WORKERS,
+        help=f"Number of parallel PDF downloads (default: {DOWNLOAD_WORKERS})"
+    )
+    parser.add_argument(
+        "--hf-transfer",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Use hf_transfer for multi-connection downloads (default: enabled if installed)"
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Print per-split progress messages"
+    )
 
     args = parser.parse_args()
 
+    configure_http_session()
+    configure_hf_transfer(args.hf_transfer)
+
     # 确定PDF输出目录
     if args.pdf_dir:
         pdf_output_dir = Path(args.pdf_dir)
@@ -261,10 +247,12 @@ def main():
     qa_success = True
 
     if args.download in ["all", "pdf"]:
-        pdf_success = download_pdf_data(pdf_output_dir, PDF_REPO_ID)
+        pdf_success = download_pdf_data(pdf_output_dir, PDF_REPO_ID, workers=args.workers)
 
     if args.download in ["all", "qa"]:
-        _, qa_success = download_qa_datasets(qa_output_dir, splits_to_download, QA_REPO_ID)
+        _, qa_success = download_qa_datasets(
+            qa_output_dir, splits_to_download, QA_REPO_ID, verbose=args.verbose
+        )
 
     # 总结
     print(f"\n{Colors.MAGENTA}{'='*60}{Colors.RESET}")
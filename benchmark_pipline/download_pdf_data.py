@@ -4,9 +4,50 @@
 下载PDF文件到主目录的 data/ 下，保持目录结构
 """
 
-from pathlib import Path
-from huggingface_hub import hf_hub_download, list_repo_files
+import os
 import sys
+import json
+import importlib.util
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from huggingface_hub import HfApi, constants
+
+# huggingface_hub 1.0 起改用httpx，移除了 configure_http_backend，此时不调整HTTP会话
+try:
+    from huggingface_hub import configure_http_backend
+except ImportError:
+    configure_http_backend = None
+
+
+def create_http_session() -> requests.Session:
+    """创建带大连接池和自动重试的HTTP会话
+
+    huggingface_hub 在每个线程中调用一次，线程内的所有请求复用同一组keep-alive连接
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=32,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def configure_http_session():
+    """让 huggingface_hub 使用 create_http_session 创建的会话
+
+    会修改 huggingface_hub 的全局设置，只在脚本入口调用，不在导入时执行；
+    huggingface_hub 不支持 configure_http_backend 时保持默认设置
+    """
+    if configure_http_backend is None:
+        return
+    configure_http_backend(backend_factory=create_http_session)
+
 
 class Colors:
     RED = '\033[31m'
@@ -21,9 +62,90 @@ class Colors:
 REPO_ID = "HEHUA2005/rag-benchmark-pdf-data"
 REPO_TYPE = "dataset"
 
+# 并行下载的线程数
+DOWNLOAD_WORKERS = int(os.environ.get("HF_PARALLEL_DOWNLOADING_WORKERS", 8))
+
+# 记录上次同步时的数据集commit SHA和PDF文件列表，SHA未变化且本地文件完整时跳过同步
+FILELIST_CACHE_NAME = ".hf_filelist.json"
+
+# hf_transfer 本身已对单个文件多连接并行下载，文件级并行过多反而会互相争抢带宽
+HF_TRANSFER_MAX_WORKERS = 4
+
+
+def configure_hf_transfer(enabled: bool = None) -> bool:
+    """开启或关闭 hf_transfer 加速下载，返回实际是否开启
+
+    enabled 为None时按是否安装了 hf_transfer 自动决定；
+    显式要求开启但未安装时给出警告并退回普通下载
+    """
+    installed = importlib.util.find_spec("hf_transfer") is not None
+    if enabled is None:
+        enabled = installed
+    elif enabled and not installed:
+        print(f"{Colors.YELLOW}⚠ hf_transfer is not installed, falling back to regular downloads "
+              f"(pip install hf_transfer){Colors.RESET}")
+        enabled = False
+
+    os.environ["HF_HUB_ENABLE_HF_TRANSFER"] = "1" if enabled else "0"
+    constants.HF_HUB_ENABLE_HF_TRANSFER = enabled
+    return enabled
+
+
+def scan_local_file_sizes(root: Path) -> dict:
+    """用 os.scandir 遍历目录，返回 {相对路径: 文件大小}（复用目录项缓存的stat信息）"""
+    sizes = {}
+    stack = [str(root)]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    relative_path = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                    sizes[relative_path] = entry.stat().st_size
+    return sizes
+
+
+def load_cached_filelist(output_dir: Path, sha: str = None):
+    """读取缓存的PDF文件列表 {相对路径: 文件大小}
+
+    sha 不为空时要求与缓存中记录的SHA一致；缓存不存在、已过期或本地文件缺失/大小不符时返回None
+    """
+    try:
+        with open(output_dir / FILELIST_CACHE_NAME, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    files = cached.get("files")
+    if not files or (sha is not None and cached.get("sha") != sha):
+        return None
 
-def download_pdf_data(output_dir: Path, repo_id: str):
-    """从Hugging Face Hub下载PDF数据"""
+    for path, size in files.items():
+        try:
+            if (output_dir / path).stat().st_size != size:
+                return None
+        except OSError:
+            return None
+    return files
+
+
+def save_filelist(output_dir: Path, sha: str, files: dict):
+    """缓存本次同步的数据集SHA和PDF文件列表"""
+    with open(output_dir / FILELIST_CACHE_NAME, 'w', encoding='utf-8') as f:
+        json.dump({"sha": sha, "files": files}, f, ensure_ascii=False)
+
+
+def download_pdf_data(output_dir: Path, repo_id: str, workers: int = DOWNLOAD_WORKERS):
+    """从Hugging Face Hub下载PDF数据
+
+    使用 snapshot_download 一次性同步仓库中的PDF和README：内部并行下载，
+    并通过 output_dir/.cache 中记录的etag跳过本地已是最新的文件。
+    数据集SHA与 .hf_filelist.json 中记录的一致且本地文件完整时，不再列出和检查远程文件
+    """
 
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}Downloading PDF Data from Hugging Face Hub{Colors.RESET}")
@@ -35,83 +157,64 @@ def download_pdf_data(output_dir: Path, repo_id: str):
     # 创建输出目录
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    if constants.HF_HUB_ENABLE_HF_TRANSFER and workers > HF_TRANSFER_MAX_WORKERS:
+        workers = HF_TRANSFER_MAX_WORKERS
+        print(f"{Colors.CYAN}hf_transfer enabled, limiting parallel downloads to {workers}{Colors.RESET}")
+
+    api = HfApi()
+
+    # 获取数据集当前的commit SHA，与缓存的文件列表比较
     try:
-        # 列出仓库中的所有文件
-        print(f"{Colors.YELLOW}Fetching file list from repository...{Colors.RESET}")
-        files = list_repo_files(repo_id=repo_id, repo_type=REPO_TYPE)
+        sha = api.dataset_info(repo_id).sha
+    except Exception as e:
+        print(f"{Colors.YELLOW}⚠ Failed to fetch dataset revision ({e}){Colors.RESET}")
+        sha = None
+
+    pdf_sizes = load_cached_filelist(output_dir, sha)
+    if pdf_sizes is not None:
+        if sha is None:
+            print(f"{Colors.YELLOW}Reusing previously downloaded files{Colors.RESET}")
+        else:
+            print(f"{Colors.GREEN}✓ Dataset unchanged ({sha[:8]}), all files up to date{Colors.RESET}")
+    elif sha is None:
+        print(f"{Colors.RED}✗ Error: cannot reach {repo_id} and no complete local copy found{Colors.RESET}")
+        return False
+    else:
+        try:
+            print(f"{Colors.YELLOW}Syncing PDF files with {workers} workers...{Colors.RESET}")
+            api.snapshot_download(
+                repo_id=repo_id,
+                repo_type=REPO_TYPE,
+                revision=sha,
+                local_dir=output_dir,
+                allow_patterns=["*.pdf", "README.md"],
+                max_workers=workers
+            )
+        except Exception as e:
+            print(f"{Colors.RED}✗ Error: {e}{Colors.RESET}")
+            return False
 
-        # 过滤出PDF文件
-        pdf_files = [f for f in files if f.endswith('.pdf')]
+        # 统计本地的PDF文件
+        pdf_sizes = {
+            path: size for path, size in scan_local_file_sizes(output_dir).items()
+            if path.endswith('.pdf')
+        }
 
-        if not pdf_files:
+        if not pdf_sizes:
             print(f"{Colors.YELLOW}No PDF files found in repository{Colors.RESET}")
             return False
 
-        print(f"{Colors.GREEN}✓ Found {len(pdf_files)} PDF files{Colors.RESET}\n")
-
-        # 下载每个PDF文件
-        success_count = 0
-        for pdf_file in pdf_files:
-            # 检查文件是否已存在
-            local_path = output_dir / pdf_file
+        save_filelist(output_dir, sha, pdf_sizes)
 
-            if local_path.exists():
-                print(f"{Colors.CYAN}Checking {pdf_file}...{Colors.RESET}")
-                file_size = local_path.stat().st_size
-                if file_size > 0:
-                    print(f"{Colors.GREEN}✓ Already exists: {local_path} ({file_size:,} bytes){Colors.RESET}")
-                    success_count += 1
-                    continue
-                else:
-                    print(f"{Colors.YELLOW}  File exists but is empty, re-downloading...{Colors.RESET}")
-
-            print(f"{Colors.YELLOW}Downloading {pdf_file}...{Colors.RESET}")
-
-            try:
-                # 下载文件
-                downloaded_path = hf_hub_download(
-                    repo_id=repo_id,
-                    repo_type=REPO_TYPE,
-                    filename=pdf_file,
-                    local_dir=output_dir,
-                    local_dir_use_symlinks=False
-                )
-
-                file_size = Path(downloaded_path).stat().st_size
-                print(f"{Colors.GREEN}✓ Downloaded {pdf_file} ({file_size:,} bytes){Colors.RESET}")
-                success_count += 1
-
-            except Exception as e:
-                print(f"{Colors.RED}✗ Failed to download {pdf_file}: {e}{Colors.RESET}")
-
-        # 下载README（如果存在）
-        if "README.md" in files:
-            print(f"\n{Colors.YELLOW}Downloading README.md...{Colors.RESET}")
-            try:
-                readme_path = hf_hub_download(
-                    repo_id=repo_id,
-                    repo_type=REPO_TYPE,
-                    filename="README.md",
-                    local_dir=output_dir,
-                    local_dir_use_symlinks=False
-                )
-                print(f"{Colors.GREEN}✓ Downloaded README.md{Colors.RESET}")
-            except Exception as e:
-                print(f"{Colors.YELLOW}⚠ Failed to download README.md: {e}{Colors.RESET}")
-
-        # 总结
-        print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
-        print(f"{Colors.BLUE}Download Summary{Colors.RESET}")
-        print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
-        print(f"Successfully downloaded: {success_count}/{len(pdf_files)} files")
-        print(f"Output directory: {output_dir}")
-        print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
-
-        return success_count == len(pdf_files)
+    # 总结
+    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"{Colors.BLUE}Download Summary{Colors.RESET}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
+    print(f"Downloaded: {len(pdf_sizes)} PDF files ({sum(pdf_sizes.values()):,} bytes)")
+    print(f"Output directory: {output_dir}")
+    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
 
-    except Exception as e:
-        print(f"{Colors.RED}✗ Error: {e}{Colors.RESET}")
-        return False
+    return True
 
 
 def main():
@@ -123,9 +226,25 @@ def main():
         type=str,
         help="Output directory (default: ../data)"
     )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=DOWNLOAD_WORKERS,
+        help=f"Number of parallel downloads (default: {DOWNLOAD_WORKERS})"
+    )
+    parser.add_argument(
+        "--hf-transfer",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Use hf_transfer for multi-connection downloads (default: enabled if installed)"
+    )
 
     args = parser.parse_args()
 
+    configure_http_session()
+    configure_hf_transfer(args.hf_transfer)
+
     # 确定输出目录
     if args.output_dir:
         output_dir = Path(args.output_dir)
@@ -135,7 +254,7 @@ def main():
         output_dir = script_dir.parent / "data"
 
     # 下载
-    success = download_pdf_data(output_dir, REPO_ID)
+    success = download_pdf_data(output_dir, REPO_ID, workers=args.workers)
 
     if success:
         print(f"{Colors.GREEN}All files downloaded successfully!{Colors.RESET}")
@@ -8,24 +8,55 @@
 注意：运行前请先使用 download_data.py 下载QA数据集
 """
 
+from __future__ import annotations
+
 import sys
 from pathlib import Path
 import csv
-import yaml
 from datetime import datetime
+import asyncio
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from tqdm import tqdm
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
 import os
 
 # 添加父目录到路径
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from rag_agent import RAGAgent
-from step4_rag_answer import process_single_question
-from step5_judge_evaluation import evaluate_single_question
-from visualize import visualize_results
-
+from visualize import (
+    DEFAULT_DPI,
+    IMAGE_FORMATS,
+    create_multi_split_visualizations,
+    init_plot_worker,
+    visualize_results
+)
+
+# spawn启动的绘图进程会以 __mp_main__ 的名字重新导入本文件，它们只需要 visualize，
+# 跳过RAG agent（chromadb、openai）、pyarrow 等重量级依赖，缩短绘图进程的启动时间
+if __name__ != "__mp_main__":
+    import yaml
+    from tqdm import tqdm
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+
+    from rag_agent import RAGAgent
+    from config import MODEL_NAME, TOP_K
+    from step4_rag_answer import (
+        ANSWER_CACHE_PATH,
+        ConcurrencyLimitedAgent,
+        CachingAgent,
+        agent_fingerprint,
+        process_single_question,
+        process_questions_async
+    )
+    from step5_judge_evaluation import (
+        JUDGE_CACHE_PATH,
+        SCORE_FIELDS,
+        JudgeCache,
+        evaluate_single_question
+    )
 
 class Colors:
     RED = '\033[31m'
@@ -49,6 +80,9 @@ ALL_SPLITS = [
     "An_Introduction_to_Xi_Jinping_Thought_on_Socialism_with_Chinese_Characteristics_for_a_New_Era"
 ]
 
+# 多个split并行处理时，防止统计信息输出互相穿插
+print_lock = threading.Lock()
+
 
 def load_config(config_path: Path):
     """加载配置文件"""
@@ -76,9 +110,10 @@ def check_datasets(qa_data_dir: Path, splits: list):
 
         if csv_file.exists():
             try:
-                # 验证文件是否有效
-                with open(csv_file, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
+                # 验证文件是否有效（只计数行，不为每行构建dict；字段中可能含换行，不能直接数行）
+                with open(csv_file, 'r', encoding='utf-8', newline='', buffering=1024 * 1024) as f:
+                    reader = csv.reader(f)
+                    next(reader, None)  # 跳过表头
                     row_count = sum(1 for _ in reader)
 
                 if row_count > 0:
@@ -103,33 +138,48 @@ def check_datasets(qa_data_dir: Path, splits: list):
 
 
 def load_questions_from_csv(csv_file: Path, max_questions: int = None):
-    """从CSV文件加载问题"""
-    questions = []
+    """从CSV文件加载问题（pyarrow多线程解析为列式表，再转换为dict列表）"""
+    # 读取表头，所有列都按字符串解析，与csv.DictReader的结果保持一致
+    with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader(f), [])
+
+    table = pacsv.read_csv(
+        csv_file,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=1 << 20),
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(column_types={name: pa.string() for name in header})
+    )
 
-    with open(csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if max_questions and i >= max_questions:
-                break
-            questions.append(row)
+    if max_questions:
+        table = table.slice(0, max_questions)
 
-    return questions
+    return table.to_pylist()
 
 
-def run_rag_answers(questions: list, agent: RAGAgent, workers: int = 4):
-    """批量生成RAG回答"""
+def run_rag_answers(
+    questions: list, agent: RAGAgent, workers: int = 4, position: int = 0, use_threads: bool = False
+):
+    """批量生成RAG回答（默认使用asyncio并发，use_threads=True时使用线程池）"""
+    print(f"\n{Colors.YELLOW}Generating RAG answers...{Colors.RESET}")
+
+    if not use_threads:
+        return asyncio.run(
+            process_questions_async(agent, questions, workers, desc="RAG Answering", position=position)
+        )
+
     results = []
     lock = threading.Lock()
 
-    print(f"\n{Colors.YELLOW}Generating RAG answers...{Colors.RESET}")
-
     with ThreadPoolExecutor(max_workers=workers) as executor:
         future_to_question = {
             executor.submit(process_single_question, agent, q, lock): q
             for q in questions
         }
 
-        with tqdm(total=len(questions), desc="RAG Answering") as pbar:
+        with tqdm(
+            total=len(questions), desc="RAG Answering", position=position,
+            mininterval=0.5, miniters=max(1, len(questions) // 200), smoothing=0
+        ) as pbar:
             for future in as_completed(future_to_question):
                 result = future.result()
                 if result:
@@ -139,26 +189,41 @@ def run_rag_answers(questions: list, agent: RAGAgent, workers: int = 4):
     return results
 
 
-def run_evaluations(rag_results: list, config: dict, workers: int = 4):
-    """批量评估"""
+def run_evaluations(
+    rag_results: list,
+    config: dict,
+    workers: int = 4,
+    position: int = 0,
+    judge_cache: JudgeCache = None
+):
+    """批量评估（提供 judge_cache 时命中缓存的问题不再调用判官模型）
+
+    返回 (evaluations, scores)，scores 是在收集结果时同步填充的 (N, 5) 评分数组，
+    列顺序与 SCORE_FIELDS 相同，统计时无需再遍历 evaluations
+    """
     evaluations = []
+    scores = np.empty((len(rag_results), len(SCORE_FIELDS)), dtype=np.float64)
 
     print(f"\n{Colors.YELLOW}Evaluating answers...{Colors.RESET}")
 
     with ThreadPoolExecutor(max_workers=workers) as executor:
         future_to_result = {
-            executor.submit(evaluate_single_question, r, config): r
+            executor.submit(evaluate_single_question, r, config, judge_cache): r
             for r in rag_results
         }
 
-        with tqdm(total=len(rag_results), desc="Evaluating") as pbar:
+        with tqdm(
+            total=len(rag_results), desc="Evaluating", position=position,
+            mininterval=0.5, miniters=max(1, len(rag_results) // 200), smoothing=0
+        ) as pbar:
             for future in as_completed(future_to_result):
                 evaluation = future.result()
                 if evaluation:
+                    scores[len(evaluations)] = [evaluation[k] for k in SCORE_FIELDS]
                     evaluations.append(evaluation)
                 pbar.update(1)
 
-    return evaluations
+    return evaluations, scores[:len(evaluations)]
 
 
 def save_results(evaluations: list, output_dir: Path, split_name: str, timestamp: str):
@@ -174,34 +239,26 @@ def save_results(evaluations: list, output_dir: Path, split_name: str, timestamp
         print(f"{Colors.YELLOW}No results to save{Colors.RESET}")
         return None
 
-    # 保存为CSV
+    # 保存为CSV（pandas一次性序列化整个表）
     fieldnames = list(evaluations[0].keys())
-
-    with open(output_file, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(evaluations)
+    pd.DataFrame(evaluations, columns=fieldnames).to_csv(output_file, index=False, encoding='utf-8')
 
     print(f"{Colors.GREEN}✓ Results saved to {output_file}{Colors.RESET}")
     return output_file
 
 
-def calculate_statistics(evaluations: list):
-    """计算统计信息"""
-    if not evaluations:
+def calculate_statistics(scores: np.ndarray):
+    """根据 run_evaluations 返回的 (N, 5) 评分数组计算统计信息"""
+    if len(scores) == 0:
         return {}
 
-    total = len(evaluations)
+    total = len(scores)
 
     # 计算各维度平均分
-    avg_source = sum(e['source_accuracy_score'] for e in evaluations) / total
-    avg_content = sum(e['content_accuracy_score'] for e in evaluations) / total
-    avg_completeness = sum(e['completeness_score'] for e in evaluations) / total
-    avg_relevance = sum(e['relevance_score'] for e in evaluations) / total
-    avg_final = sum(e['final_score'] for e in evaluations) / total
+    avg_source, avg_content, avg_completeness, avg_relevance, avg_final = scores.mean(axis=0).tolist()
 
     # 计算通过率（final_score >= 6.0）
-    pass_count = sum(1 for e in evaluations if e['final_score'] >= 6.0)
+    pass_count = int((scores[:, 4] >= 6.0).sum())
     pass_rate = pass_count / total * 100
 
     return {
@@ -240,13 +297,25 @@ def process_single_split(
     workers: int = 4,
     output_dir: Path = None,
     enable_visualization: bool = True,
-    timestamp: str = None
+    timestamp: str = None,
+    position: int = 0,
+    use_threads: bool = False,
+    viz_pool: ProcessPoolExecutor = None,
+    judge_cache: JudgeCache = None,
+    image_format: str = 'png',
+    image_dpi: int = DEFAULT_DPI
 ):
-    """处理单个split的完整流程"""
+    """处理单个split的完整流程
+
+    提供 viz_pool 时可视化在后台进程中生成，结果中的 viz_future 用于等待其完成；
+    image_format 和 image_dpi 为图表的输出格式和分辨率
+    """
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}Processing Split: {split_name}{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
 
+    viz_future = None
+
     try:
         # 1. 加载问题
         print(f"\n{Colors.YELLOW}[1/5] Loading questions...{Colors.RESET}")
@@ -258,12 +327,12 @@ def process_single_split(
 
         # 2. 生成RAG回答
         print(f"\n{Colors.YELLOW}[2/5] Generating RAG answers...{Colors.RESET}")
-        rag_results = run_rag_answers(questions, agent, workers)
+        rag_results = run_rag_answers(questions, agent, workers, position, use_threads)
         print(f"{Colors.GREEN}✓ Generated {len(rag_results)} answers{Colors.RESET}")
 
         # 3. 评估
         print(f"\n{Colors.YELLOW}[3/5] Evaluating answers...{Colors.RESET}")
-        evaluations = run_evaluations(rag_results, config, workers)
+        evaluations, scores = run_evaluations(rag_results, config, workers, position, judge_cache)
         print(f"{Colors.GREEN}✓ Completed {len(evaluations)} evaluations{Colors.RESET}")
 
         # 4. 保存结果
@@ -271,8 +340,9 @@ def process_single_split(
         output_file = save_results(evaluations, output_dir, split_name, timestamp)
 
         # 计算并显示统计信息
-        stats = calculate_statistics(evaluations)
-        print_statistics(split_name, stats)
+        stats = calculate_statistics(scores)
+        with print_lock:
+            print_statistics(split_name, stats)
 
         # 5. 生成可视化图表
         if enable_visualization and output_file:
@@ -280,13 +350,20 @@ def process_single_split(
             # 可视化结果保存在与CSV同目录下的 visualizations/{split_name}/ 下
             timestamped_dir = output_dir / timestamp
             viz_output_dir = timestamped_dir / "visualizations" / split_name
-            visualize_results(output_file, viz_output_dir, split_name)
+            if viz_pool is not None:
+                viz_future = viz_pool.submit(
+                    visualize_results, output_file, viz_output_dir, split_name, image_dpi, image_format
+                )
+            else:
+                visualize_results(output_file, viz_output_dir, split_name, image_dpi, image_format)
 
         return {
             'split_name': split_name,
             'success': True,
             'stats': stats,
-            'output_file': output_file
+            'scores': scores,
+            'output_file': output_file,
+            'viz_future': viz_future
         }
 
     except Exception as e:
@@ -311,6 +388,16 @@ def main():
         default="config.yaml",
         help="Path to config file (default: config.yaml)"
     )
+    parser.add_argument(
+        "--use-threads",
+        action="store_true",
+        help="Generate RAG answers with a thread pool instead of asyncio"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the RAG answer and judge score caches and re-run every question"
+    )
 
     args = parser.parse_args()
 
@@ -327,6 +414,17 @@ def main():
     splits_config = benchmark_config.get('splits', 'all')
     max_questions = benchmark_config.get('max_questions_per_split', None)
     enable_visualization = benchmark_config.get('enable_visualization', True)
+    # batch_size 为旧的配置名，含义相同
+    max_concurrent_requests = benchmark_config.get(
+        'max_concurrent_rag_requests', benchmark_config.get('batch_size', 1)
+    )
+    image_format = benchmark_config.get('visualization_format', 'png')
+    image_dpi = benchmark_config.get('visualization_dpi', DEFAULT_DPI)
+
+    if image_format not in IMAGE_FORMATS:
+        print(f"{Colors.RED}Invalid visualization_format: {image_format}{Colors.RESET}")
+        print(f"Available formats: {', '.join(IMAGE_FORMATS)}")
+        return
 
     # 处理max_questions: null 或 -1 表示无限制
     if max_questions == -1:
@@ -357,8 +455,15 @@ def main():
     else:
         print(f"Max questions per split: ALL")
     print(f"Workers: {workers}")
+    if max_concurrent_requests > 1:
+        print(f"Max concurrent RAG requests (all splits): {max_concurrent_requests}")
     print(f"Output directory: {output_dir}")
-    print(f"Visualization: {'Enabled' if enable_visualization else 'Disabled'}")
+    if enable_visualization:
+        print(f"Visualization: Enabled ({image_format}, {image_dpi} dpi)")
+    else:
+        print(f"Visualization: Disabled")
+    print(f"Answer cache: {'Disabled' if args.no_cache else ANSWER_CACHE_PATH}")
+    print(f"Judge cache: {'Disabled' if args.no_cache else JUDGE_CACHE_PATH}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
 
     # 1. 检查数据集是否存在
@@ -376,31 +481,97 @@ def main():
     print(f"{Colors.YELLOW}Initializing RAG Agent...{Colors.RESET}")
     try:
         agent = RAGAgent()
+        fingerprint = agent_fingerprint(agent)
+        if max_concurrent_requests > 1:
+            agent = ConcurrencyLimitedAgent(agent, max_concurrency=max_concurrent_requests)
+        # 缓存在最外层，命中缓存的问题不会进入请求队列
+        if not args.no_cache:
+            agent = CachingAgent(
+                agent, ANSWER_CACHE_PATH, model=MODEL_NAME, top_k=TOP_K, fingerprint=fingerprint
+            )
         print(f"{Colors.GREEN}✓ RAG Agent initialized{Colors.RESET}")
     except Exception as e:
         print(f"{Colors.RED}✗ Failed to initialize RAG Agent: {e}{Colors.RESET}")
         return
 
+    judge_cache = None
+    if not args.no_cache:
+        judge_cache = JudgeCache(JUDGE_CACHE_PATH, config['api']['model_id'])
+
     # 3. 生成本次运行的时间戳
     run_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     print(f"\n{Colors.CYAN}Run timestamp: {run_timestamp}{Colors.RESET}")
 
-    # 4. 处理每个split
-    all_results = []
-
-    for split_name, csv_file in available_files.items():
-        result = process_single_split(
-            split_name=split_name,
-            csv_file=csv_file,
-            agent=agent,
-            config=config,
-            max_questions=max_questions,
-            workers=workers,
-            output_dir=output_dir,
-            enable_visualization=enable_visualization,
-            timestamp=run_timestamp
+    # 4. 并行处理每个split（各split相互独立，瓶颈在LLM API调用）
+    # 可视化是CPU密集型任务，放到常驻的绘图进程中生成，不阻塞后续的RAG回答和评估；
+    # 每个进程只在启动时初始化一次matplotlib，之后依次绘制分配到的各split的图表
+    # 使用spawn启动进程，避免在多线程运行时fork
+    viz_pool = None
+    if enable_visualization:
+        viz_pool = ProcessPoolExecutor(
+            max_workers=min(len(available_files), os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_plot_worker
         )
-        all_results.append(result)
+
+    with ThreadPoolExecutor(max_workers=len(available_files)) as executor:
+        futures = [
+            executor.submit(
+                process_single_split,
+                split_name=split_name,
+                csv_file=csv_file,
+                agent=agent,
+                config=config,
+                max_questions=max_questions,
+                workers=workers,
+                output_dir=output_dir,
+                enable_visualization=enable_visualization,
+                timestamp=run_timestamp,
+                position=i,
+                use_threads=args.use_threads,
+                viz_pool=viz_pool,
+                judge_cache=judge_cache,
+                image_format=image_format,
+                image_dpi=image_dpi
+            )
+            for i, (split_name, csv_file) in enumerate(available_files.items())
+        ]
+        # 按split顺序收集结果，保证总结输出顺序稳定
+        all_results = [future.result() for future in futures]
+
+    # 多个split时额外生成一张所有split的对比图
+    multi_split_future = None
+    scores_by_split = {
+        result['split_name']: result['scores']
+        for result in all_results if result.get('success')
+    }
+    if enable_visualization and len(scores_by_split) > 1:
+        viz_dir = output_dir / run_timestamp / "visualizations"
+        if viz_pool is not None:
+            multi_split_future = viz_pool.submit(
+                create_multi_split_visualizations, scores_by_split, viz_dir, image_dpi, image_format
+            )
+        else:
+            create_multi_split_visualizations(scores_by_split, viz_dir, image_dpi, image_format)
+
+    # 等待所有可视化任务完成
+    if viz_pool is not None:
+        print(f"\n{Colors.YELLOW}Waiting for visualizations to finish...{Colors.RESET}")
+        for result in all_results:
+            if result.get('viz_future'):
+                result['viz_future'].result()
+        if multi_split_future is not None:
+            multi_split_future.result()
+        viz_pool.shutdown()
+
+    if judge_cache is not None:
+        judge_cache.close()
+
+    if isinstance(agent, CachingAgent):
+        agent.close()
+        agent = agent.agent
+    if isinstance(agent, ConcurrencyLimitedAgent):
+        agent.close()
 
     # 5. 总结
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
@@ -6,11 +6,15 @@ Step 4: RAG系统回答问题
 
 import sys
 import csv
+import queue
+import sqlite3
+import hashlib
+import asyncio
 import threading
 from pathlib import Path
 from typing import List, Dict
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 
 class Colors:
@@ -22,6 +26,165 @@ class Colors:
     RESET = '\033[0m'
 
 
+# RAG回答的磁盘缓存位置
+ANSWER_CACHE_PATH = Path(__file__).parent / ".cache" / "rag_answers.sqlite"
+
+# 影响RAG回答的源文件（相对项目根目录），任一文件修改后缓存的回答失效
+RAG_SOURCE_FILES = [
+    "rag_agent.py", "vector_store.py", "text_splitter.py",
+    "document_loader.py", "process_data.py", "config.py"
+]
+
+
+def agent_fingerprint(agent) -> str:
+    """RAG实现的指纹：系统提示词和RAG相关源码的哈希"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(getattr(agent, "system_prompt", "")).encode("utf-8"))
+    project_root = Path(__file__).parent.parent
+    for name in RAG_SOURCE_FILES:
+        try:
+            digest.update((project_root / name).read_bytes())
+        except OSError:
+            continue
+    return digest.hexdigest()
+
+
+class CachingAgent:
+    """按问题缓存回答的agent包装器
+
+    缓存键为 (模型名, top_k, RAG实现指纹, 问题) 的哈希，先查内存再查磁盘上的sqlite文件，
+    重复运行benchmark时相同问题不会再次调用RAG流程；修改系统提示词或RAG源码后指纹变化，
+    旧回答不再命中。接口与 RAGAgent 相同。
+    """
+
+    # RAGAgent.generate_response 出错时返回的回答前缀，这类回答不缓存
+    ERROR_PREFIX = "生成回答时出错"
+
+    def __init__(self, agent, cache_path: Path, model: str = "", top_k: int = 0, fingerprint: str = ""):
+        self.agent = agent
+        self.key_prefix = f"{model}|{top_k}|{fingerprint}|"
+        self._memory = {}
+        self._lock = threading.Lock()
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(cache_path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT)")
+        self._db.commit()
+
+    def _key(self, query: str) -> str:
+        return hashlib.blake2b((self.key_prefix + query).encode("utf-8"), digest_size=16).hexdigest()
+
+    def _get(self, key: str):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+            row = self._db.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._memory[key] = row[0]
+                return row[0]
+        return None
+
+    def _put(self, key: str, answer: str):
+        if not isinstance(answer, str) or answer.startswith(self.ERROR_PREFIX):
+            return
+        with self._lock:
+            self._memory[key] = answer
+            self._db.execute("INSERT OR REPLACE INTO answers (key, answer) VALUES (?, ?)", (key, answer))
+            self._db.commit()
+
+    def answer_question(self, query: str, chat_history=None) -> str:
+        if chat_history:
+            return self.agent.answer_question(query, chat_history=chat_history)
+        key = self._key(query)
+        answer = self._get(key)
+        if answer is None:
+            answer = self.agent.answer_question(query, chat_history=None)
+            self._put(key, answer)
+        return answer
+
+    async def answer_question_async(self, query: str, chat_history=None) -> str:
+        if chat_history:
+            return await asyncio.to_thread(self.agent.answer_question, query, chat_history=chat_history)
+        key = self._key(query)
+        answer = self._get(key)
+        if answer is None:
+            if hasattr(self.agent, "answer_question_async"):
+                answer = await self.agent.answer_question_async(query, chat_history=None)
+            else:
+                answer = await asyncio.to_thread(self.agent.answer_question, query, chat_history=None)
+            self._put(key, answer)
+        return answer
+
+    def close(self):
+        self._db.close()
+
+
+class ConcurrencyLimitedAgent:
+    """限制所有split合计并发请求数的agent包装器
+
+    各worker（包括不同split的线程）提交的问题进入同一个队列，后台事件循环取出后
+    立即作为独立任务开始处理，最多同时进行 max_concurrency 个，慢请求不会阻塞其他请求。
+    问题不会被合并成批量请求，这里只是全局的并发上限。
+    接口与 RAGAgent 相同，可直接替换 agent 使用。
+    """
+
+    def __init__(self, agent, max_concurrency: int = 8):
+        self.agent = agent
+        self.max_concurrency = max_concurrency
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, chat_history=None) -> Future:
+        """提交一个问题，返回最终包含回答的Future"""
+        future = Future()
+        self._queue.put((query, chat_history, future))
+        return future
+
+    def answer_question(self, query: str, chat_history=None) -> str:
+        return self.submit(query, chat_history).result()
+
+    async def answer_question_async(self, query: str, chat_history=None) -> str:
+        return await asyncio.wrap_future(self.submit(query, chat_history))
+
+    def close(self):
+        """处理完已提交的问题后停止后台线程"""
+        self._queue.put(None)
+        self._thread.join()
+
+    async def _answer(self, semaphore: asyncio.Semaphore, query: str, chat_history, future: Future):
+        try:
+            async with semaphore:
+                if hasattr(self.agent, "answer_question_async"):
+                    answer = await self.agent.answer_question_async(query, chat_history=chat_history)
+                else:
+                    answer = await asyncio.to_thread(self.agent.answer_question, query, chat_history=chat_history)
+            future.set_result(answer)
+        except Exception as e:
+            future.set_exception(e)
+
+    async def _dispatch(self):
+        # 专用线程池：一个线程阻塞等待队列，其余 max_concurrency 个执行 answer_question，
+        # 不受默认线程池 min(32, CPU数+4) 的大小限制
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.max_concurrency + 1, thread_name_prefix="rag-shared")
+        )
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = set()
+        while True:
+            item = await asyncio.to_thread(self._queue.get)
+            if item is None:
+                break
+            task = asyncio.create_task(self._answer(semaphore, *item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    def _run(self):
+        asyncio.run(self._dispatch())
+
+
 def process_single_question(agent, question: Dict, lock: threading.Lock) -> Dict:
     """处理单个问题（用于并发）"""
     query = question.get("query", "").strip()
@@ -34,18 +197,79 @@ def process_single_question(agent, question: Dict, lock: threading.Lock) -> Dict
         if len(agent_answer) > 1000:
             agent_answer = agent_answer[:1000]
 
-        # 保留step3的所有字段，添加agent_answer
-        result = dict(question)  # 复制所有原始字段
-        result["agent_answer"] = agent_answer
-        return result
+        # 保留step3的所有字段，直接在原字典上添加agent_answer（调用方不再复用该字典）
+        question["agent_answer"] = agent_answer
+        return question
     except Exception as e:
-        result = dict(question)
-        result["agent_answer"] = f"[错误] {str(e)}"
-        return result
+        question["agent_answer"] = f"[错误] {str(e)}"
+        return question
+
+
+async def process_single_question_async(agent, question: Dict, semaphore: asyncio.Semaphore) -> Dict:
+    """处理单个问题（异步版本，semaphore限制同时进行的请求数）"""
+    query = question.get("query", "").strip()
+    if not query:
+        return None
+
+    async with semaphore:
+        try:
+            if hasattr(agent, "answer_question_async"):
+                agent_answer = await agent.answer_question_async(query, chat_history=None)
+            else:
+                # agent没有异步接口时退回到线程中调用同步接口
+                agent_answer = await asyncio.to_thread(agent.answer_question, query, chat_history=None)
+
+            if len(agent_answer) > 1000:
+                agent_answer = agent_answer[:1000]
 
+            question["agent_answer"] = agent_answer
+            return question
+        except Exception as e:
+            question["agent_answer"] = f"[错误] {str(e)}"
+            return question
+
+
+async def process_questions_async(
+    agent, questions: List[Dict], workers: int = 4, desc: str = "处理问题", position: int = 0
+) -> List[Dict]:
+    """在单个事件循环中并发处理问题，最多同时进行 workers 个请求
+
+    answer_question 是同步接口，通过 asyncio.to_thread 在事件循环的默认线程池中执行；
+    默认线程池最多只有 min(32, CPU数+4) 个线程，因此先换成 workers 个线程的线程池，
+    否则较大的 workers 会被悄悄限制。调用方应为本函数单独运行事件循环（如 asyncio.run）
+    """
+    results = []
+    semaphore = asyncio.Semaphore(workers)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-answer")
+    )
+
+    tasks = [
+        asyncio.create_task(process_single_question_async(agent, q, semaphore))
+        for q in questions
+    ]
+
+    with tqdm(
+        total=len(questions), desc=desc, position=position,
+        mininterval=0.5, miniters=max(1, len(questions) // 200), smoothing=0
+    ) as pbar:
+        for task in asyncio.as_completed(tasks):
+            result = await task
+            if result:
+                results.append(result)
+            pbar.update(1)
+
+    return results
+
+
+def process_questions_parallel(
+    agent, questions: List[Dict], workers: int = 4, use_threads: bool = False
+) -> List[Dict]:
+    """并行处理问题（默认使用asyncio，use_threads=True时使用线程池）"""
+    if not use_threads:
+        print(f"{Colors.CYAN}使用 asyncio 并发处理问题（最多 {workers} 个并发请求）{Colors.RESET}")
+        return asyncio.run(process_questions_async(agent, questions, workers))
 
-def process_questions_parallel(agent, questions: List[Dict], workers: int = 4) -> List[Dict]:
-    """并行处理问题"""
     results = []
     lock = threading.Lock()
 
@@ -57,7 +281,10 @@ def process_questions_parallel(agent, questions: List[Dict], workers: int = 4) -
             for q in questions
         }
 
-        with tqdm(total=len(questions), desc="处理问题") as pbar:
+        with tqdm(
+            total=len(questions), desc="处理问题",
+            mininterval=0.5, miniters=max(1, len(questions) // 200), smoothing=0
+        ) as pbar:
             for future in as_completed(future_to_question):
                 result = future.result()
                 if result:
@@ -75,11 +302,14 @@ def main():
     parser.add_argument("--input", "-i", required=True, help="输入的benchmark CSV文件")
     parser.add_argument("--output", "-o", required=True, help="输出的CSV文件（包含agent_answer）")
     parser.add_argument("--workers", "-w", type=int, default=4, help="并行worker数量（默认：4）")
+    parser.add_argument("--use-threads", action="store_true", help="使用线程池代替asyncio处理问题")
+    parser.add_argument("--no-cache", action="store_true", help="不使用回答缓存，所有问题重新调用RAG")
     args = parser.parse_args()
 
     # 导入RAG Agent
     sys.path.insert(0, str(Path(__file__).parent.parent))
     from rag_agent import RAGAgent
+    from config import MODEL_NAME, TOP_K
 
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}Step 4: RAG Answer Generation{Colors.RESET}")
@@ -92,6 +322,10 @@ def main():
     # 初始化agent
     print(f"{Colors.YELLOW}初始化RAG Agent...{Colors.RESET}")
     agent = RAGAgent()
+    if not args.no_cache:
+        agent = CachingAgent(
+            agent, ANSWER_CACHE_PATH, model=MODEL_NAME, top_k=TOP_K, fingerprint=agent_fingerprint(agent)
+        )
     print(f"{Colors.GREEN}✓ RAG Agent初始化完成{Colors.RESET}\n")
 
     # 读取问题
@@ -105,20 +339,23 @@ def main():
 
     # 并行处理
     print(f"{Colors.YELLOW}开始处理问题...{Colors.RESET}")
-    results = process_questions_parallel(agent, questions, workers=args.workers)
+    results = process_questions_parallel(agent, questions, workers=args.workers, use_threads=args.use_threads)
 
     # 保存结果
     print(f"\n{Colors.YELLOW}保存结果...{Colors.RESET}")
     fieldnames = ["query", "standard_answer", "course", "material", "page_range", "question_type", "agent_answer"]
 
-    with open(args.output, 'w', encoding='utf-8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for result in results:
-            writer.writerow(result)
+    with open(args.output, 'w', encoding='utf-8', newline='', buffering=1 << 20) as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        # 缺少某个字段的行写空字符串（与 DictWriter 的默认行为一致），不因KeyError丢掉整批回答
+        writer.writerows(tuple(result.get(k, "") for k in fieldnames) for result in results)
 
     print(f"{Colors.GREEN}✓ 保存了 {len(results)} 个结果到: {args.output}{Colors.RESET}")
 
+    if isinstance(agent, CachingAgent):
+        agent.close()
+
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.GREEN}Step 4 完成!{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
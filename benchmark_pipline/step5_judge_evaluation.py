@@ -4,16 +4,31 @@ Step 5: Judge Model 评分模块
 独立版本，不依赖benchmark目录
 """
 
+import re
 import json
+import time
+import random
 import csv
 import yaml
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+import asyncio
 import logging
+import functools
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator, Optional
 from tqdm import tqdm
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, RateLimitError
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+# 安装了 orjson（pip install orjson）时用它输出 JSON 结果文件，否则退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class Colors:
@@ -25,24 +40,33 @@ class Colors:
     RESET = "\033[0m"
 
 
-def load_config(config_path: Path) -> Dict:
-    """加载配置文件"""
-    with open(config_path, 'r', encoding='utf-8') as f:
-        config = yaml.safe_load(f)
-    return config
+# 各维度得分字段，顺序即 score_matrix 的列顺序
+SCORE_FIELDS = (
+    "source_accuracy_score",
+    "content_accuracy_score",
+    "completeness_score",
+    "relevance_score",
+    "final_score",
+)
 
+# 重试等待：指数退避的基数（秒），被限流时使用更长的基数，单次最多等待 RETRY_MAX_DELAY 秒
+RETRY_BASE_DELAY = 1.0
+RATE_LIMIT_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 60.0
 
-def build_judge_prompt(
-    query: str,
-    standard_answer: str,
-    rag_answer: str,
-    standard_page_range: str,
-    standard_material: str,
-    config: Dict,
-) -> str:
-    """构建判官评分提示词"""
+# 判官评分缓存文件，重复运行时相同提示词不再调用API
+JUDGE_CACHE_PATH = Path(__file__).parent / ".cache" / "judge_scores.sqlite"
+
+# parse_judge_response 解析失败时返回的理由前缀，这类结果不缓存
+PARSE_ERROR_PREFIX = "解析失败"
+
+# 解析评分结果用：从第一个 { 开始直接解码，失败时再匹配代码块中的 JSON
+JSON_DECODER = json.JSONDecoder()
+JSON_BLOCK_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
 
-    prompt = f"""你是一个专业的RAG系统评估判官。你的任务是对RAG系统的回答进行多维度评分。
+
+# 判官评分提示词模板，导入时构建一次，每个问题只做 format 填充
+JUDGE_PROMPT_TEMPLATE = """你是一个专业的RAG系统评估判官。你的任务是对RAG系统的回答进行多维度评分。
 
 ## 评分标准
 
@@ -113,31 +137,141 @@ def build_judge_prompt(
 请只输出 JSON，不要有其他内容。
 """
 
-    return prompt
+
+class JudgeCache:
+    """按评分提示词缓存判官评分结果
+
+    缓存键为 (判官模型, 完整提示词) 的SHA-256，提示词包含问题、标准答案、来源和agent回答，
+    任一字段或评分模板变化都会重新评分。先查内存再查磁盘上的sqlite文件，多线程共享一个连接。
+    """
+
+    def __init__(self, cache_path: Path, model_id: str):
+        self.key_prefix = f"{model_id}|"
+        self._memory = {}
+        self._lock = threading.Lock()
+
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(cache_path), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, json TEXT)")
+        self._db.commit()
+
+    def key(self, prompt: str) -> str:
+        return hashlib.sha256((self.key_prefix + prompt).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+            row = self._db.execute("SELECT json FROM scores WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._memory[key] = json.loads(row[0])
+                return self._memory[key]
+        return None
+
+    def put(self, key: str, judge_result: Dict):
+        if str(judge_result.get("source_accuracy_reasoning", "")).startswith(PARSE_ERROR_PREFIX):
+            return
+        with self._lock:
+            self._memory[key] = judge_result
+            self._db.execute(
+                "INSERT OR REPLACE INTO scores (key, json) VALUES (?, ?)",
+                (key, json.dumps(judge_result, ensure_ascii=False)),
+            )
+            self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+
+def load_config(config_path: Path) -> Dict:
+    """加载配置文件"""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+    return config
+
+
+def build_judge_prompt(
+    query: str,
+    standard_answer: str,
+    rag_answer: str,
+    standard_page_range: str,
+    standard_material: str,
+    config: Dict,
+) -> str:
+    """构建判官评分提示词（只填入每个问题的变量部分）"""
+    return JUDGE_PROMPT_TEMPLATE.format(
+        query=query,
+        standard_answer=standard_answer,
+        rag_answer=rag_answer,
+        standard_page_range=standard_page_range,
+        standard_material=standard_material,
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def get_client(api_key: str, base_url: str) -> OpenAI:
+    """获取 OpenAI 客户端（按配置缓存，所有线程共享同一个连接池）"""
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+
+def build_llm_request(prompt: str, api_config: Dict) -> Dict:
+    """构建评分请求参数（同步和异步调用共用）"""
+    return {
+        "model": api_config["model_id"],
+        "messages": [
+            {
+                "role": "system",
+                "content": "你是一个专业的RAG系统评估判官，擅长客观、公正地评估答案质量。",
+            },
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.3,  # 使用较低的温度以保证评分的一致性
+        "max_tokens": api_config["max_tokens"],
+    }
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """计算第 attempt 次失败后的等待时间：优先使用响应中的 Retry-After，否则指数退避加随机抖动"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    retry_after = headers.get("retry-after") if headers is not None else None
+    if retry_after:
+        try:
+            return min(RETRY_MAX_DELAY, float(retry_after))
+        except ValueError:
+            pass  # HTTP日期格式，按指数退避处理
+
+    base = RATE_LIMIT_BASE_DELAY if isinstance(error, RateLimitError) else RETRY_BASE_DELAY
+    return min(RETRY_MAX_DELAY, base * 2 ** attempt + random.random())
 
 
 def call_llm(prompt: str, config: Dict) -> str:
     """调用 LLM API"""
     api_config = config["api"]
+    client = get_client(api_config["api_key"], api_config["base_url"])
+    request = build_llm_request(prompt, api_config)
 
     for attempt in range(api_config["max_retries"]):
         try:
-            client = OpenAI(
-                api_key=api_config["api_key"], base_url=api_config["base_url"]
+            response = client.chat.completions.create(**request)
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            logging.warning(
+                f"API 调用失败 (尝试 {attempt + 1}/{api_config['max_retries']}): {e}"
             )
+            if attempt == api_config["max_retries"] - 1:
+                raise
+            time.sleep(retry_delay(e, attempt))
+    return ""
 
-            response = client.chat.completions.create(
-                model=api_config["model_id"],
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的RAG系统评估判官，擅长客观、公正地评估答案质量。",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.3,  # 使用较低的温度以保证评分的一致性
-                max_tokens=api_config["max_tokens"],
-            )
+
+async def call_llm_async(prompt: str, config: Dict, client: AsyncOpenAI) -> str:
+    """异步调用 LLM API（client 由调用方在当前事件循环中创建）"""
+    api_config = config["api"]
+    request = build_llm_request(prompt, api_config)
+
+    for attempt in range(api_config["max_retries"]):
+        try:
+            response = await client.chat.completions.create(**request)
             return response.choices[0].message.content.strip()
         except Exception as e:
             logging.warning(
@@ -145,21 +279,26 @@ def call_llm(prompt: str, config: Dict) -> str:
             )
             if attempt == api_config["max_retries"] - 1:
                 raise
+            await asyncio.sleep(retry_delay(e, attempt))
     return ""
 
 
 def parse_judge_response(response: str) -> Dict:
     """解析 LLM 返回的评分结果"""
     try:
-        # 尝试提取 JSON 部分
-        if "```json" in response:
-            json_str = response.split("```json")[1].split("```")[0].strip()
-        elif "```" in response:
-            json_str = response.split("```")[1].split("```")[0].strip()
-        else:
-            json_str = response.strip()
-
-        result = json.loads(json_str)
+        # 从第一个 { 开始解码一个完整的JSON对象，忽略前后的说明文字和代码块标记；
+        # 解析结果与是否安装 orjson 无关
+        start = response.find("{")
+        if start == -1:
+            raise ValueError("响应中没有 JSON 对象")
+        try:
+            result, _ = JSON_DECODER.raw_decode(response, start)
+        except ValueError:
+            # 前后的文字里也有花括号等情况下，退回匹配代码块
+            match = JSON_BLOCK_PATTERN.search(response)
+            if match is None:
+                raise
+            result = json.loads(match.group(1))
 
         # 验证必要字段
         required_fields = [
@@ -184,7 +323,7 @@ def parse_judge_response(response: str) -> Dict:
             "completeness_score": 0.0,
             "relevance_score": 0.0,
             "final_score": 0.0,
-            "source_accuracy_reasoning": f"解析失败: {str(e)}",
+            "source_accuracy_reasoning": f"{PARSE_ERROR_PREFIX}: {str(e)}",
             "content_accuracy_reasoning": "",
             "completeness_reasoning": "",
             "relevance_reasoning": "",
@@ -192,46 +331,46 @@ def parse_judge_response(response: str) -> Dict:
         }
 
 
-def load_rag_results(rag_results_path: Path) -> List[Dict]:
-    """加载 step4 的结果（包含标准答案和agent回答）"""
-    results = []
-    with open(rag_results_path, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            results.append(row)
-    return results
+def score_matrix(results: List[Dict]) -> np.ndarray:
+    """把评估结果的各维度得分收集成 (问题数, 维度数) 的数组，列顺序与 SCORE_FIELDS 相同"""
+    return np.fromiter(
+        (r.get(field, 0.0) for r in results for field in SCORE_FIELDS),
+        dtype=np.float64,
+        count=len(results) * len(SCORE_FIELDS),
+    ).reshape(-1, len(SCORE_FIELDS))
 
 
-def evaluate_single_question(row: Dict, config: Dict) -> Dict:
-    """评估单个问题（row包含step4的所有字段）"""
-    query = row.get("query", "")
-    standard_answer = row.get("standard_answer", "")
-    standard_page_range = row.get("page_range", "")
-    standard_material = row.get("material", "")
-    agent_answer = row.get("agent_answer", "")
+def iter_rag_results(rag_results_path: Path) -> Iterator[Dict]:
+    """逐行读取 step4 的结果（包含标准答案和agent回答），不整体载入内存"""
+    with open(rag_results_path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
 
-    # 构建提示词
-    prompt = build_judge_prompt(
-        query=query,
-        standard_answer=standard_answer,
-        rag_answer=agent_answer,
-        standard_page_range=standard_page_range,
-        standard_material=standard_material,
+
+def count_rag_results(rag_results_path: Path) -> int:
+    """统计 step4 结果的问题数（用 csv.reader 计数，正确处理跨行的回答字段）"""
+    with open(rag_results_path, "r", encoding="utf-8", newline="") as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
+
+
+def build_row_prompt(row: Dict, config: Dict) -> str:
+    """根据step5输入行构建评分提示词"""
+    return build_judge_prompt(
+        query=row.get("query", ""),
+        standard_answer=row.get("standard_answer", ""),
+        rag_answer=row.get("agent_answer", ""),
+        standard_page_range=row.get("page_range", ""),
+        standard_material=row.get("material", ""),
         config=config,
     )
 
-    # 调用 LLM
-    response = call_llm(prompt, config)
-
-    # 解析结果
-    judge_result = parse_judge_response(response)
 
-    # 合并结果
-    result = {
-        "query": query,
-        "standard_answer": standard_answer,
-        "standard_page_range": standard_page_range,
-        "agent_answer": agent_answer,
+def merge_judge_result(row: Dict, judge_result: Dict) -> Dict:
+    """合并原始行和评分结果"""
+    return {
+        "query": row.get("query", ""),
+        "standard_answer": row.get("standard_answer", ""),
+        "standard_page_range": row.get("page_range", ""),
+        "agent_answer": row.get("agent_answer", ""),
         "source_accuracy_score": judge_result.get("source_accuracy_score", 0.0),
         "content_accuracy_score": judge_result.get("content_accuracy_score", 0.0),
         "completeness_score": judge_result.get("completeness_score", 0.0),
@@ -245,70 +384,157 @@ def evaluate_single_question(row: Dict, config: Dict) -> Dict:
         "relevance_reasoning": judge_result.get("relevance_reasoning", ""),
         "overall_reasoning": judge_result.get("overall_reasoning", ""),
         "course": row.get("course", ""),
-        "material": standard_material,
+        "material": row.get("material", ""),
         "question_type": row.get("question_type", ""),
     }
 
-    return result
+
+def build_failed_result(row: Dict, error: Exception) -> Dict:
+    """评估失败时记录日志并返回默认结果，避免丢失这个问题"""
+    logging.error(f"评估失败: {row.get('query', '')[:50]}... - {error}")
+    return merge_judge_result(row, {"source_accuracy_reasoning": f"评估失败: {str(error)}"})
+
+
+def evaluate_single_question(
+    row: Dict, config: Dict, cache: Optional[JudgeCache] = None
+) -> Dict:
+    """评估单个问题（row包含step4的所有字段），提供 cache 时命中缓存的问题不再调用API"""
+    # 构建提示词
+    prompt = build_row_prompt(row, config)
+    key = cache.key(prompt) if cache is not None else None
+    judge_result = cache.get(key) if cache is not None else None
+
+    if judge_result is None:
+        # 调用 LLM 并解析结果
+        response = call_llm(prompt, config)
+        judge_result = parse_judge_response(response)
+        if cache is not None:
+            cache.put(key, judge_result)
+
+    # 合并结果
+    return merge_judge_result(row, judge_result)
 
 
-def evaluate_single_question_wrapper(row: Dict, config: Dict) -> Dict:
+def evaluate_single_question_wrapper(
+    row: Dict, config: Dict, cache: Optional[JudgeCache] = None
+) -> Dict:
     """评估单个问题的包装函数（用于并发处理）"""
     try:
-        result = evaluate_single_question(row, config)
+        result = evaluate_single_question(row, config, cache)
         return result
     except Exception as e:
-        logging.error(f"评估失败: {e}")
-        query = row.get("query", "")[:50]
-        print(f"{Colors.RED}✗ 评估失败: {query}... - {e}{Colors.RESET}")
-        # 返回一个默认结果，避免丢失这个问题
-        return {
-            "query": row.get("query", ""),
-            "standard_answer": row.get("standard_answer", ""),
-            "standard_page_range": row.get("page_range", ""),
-            "agent_answer": row.get("agent_answer", ""),
-            "source_accuracy_score": 0.0,
-            "content_accuracy_score": 0.0,
-            "completeness_score": 0.0,
-            "relevance_score": 0.0,
-            "final_score": 0.0,
-            "source_accuracy_reasoning": f"评估失败: {str(e)}",
-            "content_accuracy_reasoning": "",
-            "completeness_reasoning": "",
-            "relevance_reasoning": "",
-            "overall_reasoning": "",
-            "course": row.get("course", ""),
-            "material": row.get("material", ""),
-            "question_type": row.get("question_type", ""),
-        }
+        return build_failed_result(row, e)
 
 
-def evaluate_batch(
-    rag_results: List[Dict], config: Dict, workers: int = 4
+async def evaluate_single_question_async(
+    row: Dict,
+    config: Dict,
+    client: AsyncOpenAI,
+    semaphore: asyncio.Semaphore,
+    cache: Optional[JudgeCache] = None,
+) -> Dict:
+    """异步评估单个问题，通过信号量限制并发请求数（命中缓存时不占用并发名额）"""
+    prompt = build_row_prompt(row, config)
+    key = cache.key(prompt) if cache is not None else None
+    judge_result = cache.get(key) if cache is not None else None
+    if judge_result is not None:
+        return merge_judge_result(row, judge_result)
+
+    async with semaphore:
+        try:
+            response = await call_llm_async(prompt, config, client)
+        except Exception as e:
+            return build_failed_result(row, e)
+
+    judge_result = parse_judge_response(response)
+    if cache is not None:
+        cache.put(key, judge_result)
+    return merge_judge_result(row, judge_result)
+
+
+async def evaluate_batch_async(
+    rag_results: Iterable[Dict],
+    config: Dict,
+    workers: int,
+    total: Optional[int] = None,
+    cache: Optional[JudgeCache] = None,
 ) -> List[Dict]:
-    """批量评估问题（支持并行处理）"""
+    """在单个事件循环中并发评估所有问题，边读取边提交，最多保留 workers*2 个任务"""
+    api_config = config["api"]
+    semaphore = asyncio.Semaphore(workers)
+    window = workers * 2
     all_results = []
 
-    print(f"{Colors.CYAN}使用 {workers} 个并行worker进行评估{Colors.RESET}")
+    # 客户端绑定当前事件循环，用完即关闭
+    async with AsyncOpenAI(
+        api_key=api_config["api_key"], base_url=api_config["base_url"]
+    ) as client:
+        with tqdm(
+            total=total, desc="评估问题",
+            mininterval=0.5, miniters=max(1, (total or 0) // 200), smoothing=0
+        ) as pbar:
+            pending = set()
+            for row in rag_results:
+                if len(pending) >= window:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    all_results.extend(task.result() for task in done)
+                    pbar.update(len(done))
+                pending.add(asyncio.create_task(
+                    evaluate_single_question_async(row, config, client, semaphore, cache)
+                ))
+
+            for task in asyncio.as_completed(pending):
+                all_results.append(await task)
+                pbar.update(1)
+
+    return all_results
 
-    # 使用线程池并行处理
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        # 提交所有任务
-        future_to_row = {
-            executor.submit(evaluate_single_question_wrapper, row, config): row
-            for row in rag_results
-        }
 
-        # 使用tqdm显示进度
-        with tqdm(total=len(rag_results), desc="评估问题") as pbar:
-            for future in as_completed(future_to_row):
-                result = future.result()
-                all_results.append(result)
+def evaluate_batch(
+    rag_results: Iterable[Dict],
+    config: Dict,
+    workers: int = 4,
+    backend: str = "async",
+    total: Optional[int] = None,
+    cache: Optional[JudgeCache] = None,
+) -> List[Dict]:
+    """批量评估问题（默认 asyncio 并发，backend="thread" 时使用线程池）
+
+    rag_results 可以是生成器，total 仅用于进度条显示，cache 为可选的评分缓存
+    """
+    if backend == "async":
+        print(f"{Colors.CYAN}使用 asyncio 并发评估，最大并发请求数 {workers}{Colors.RESET}")
+        all_results = asyncio.run(
+            evaluate_batch_async(rag_results, config, workers, total, cache)
+        )
+    else:
+        all_results = []
+        window = workers * 2
+
+        print(f"{Colors.CYAN}使用 {workers} 个并行worker进行评估{Colors.RESET}")
+
+        # 使用线程池并行处理，边读取边提交，最多保留 workers*2 个未完成任务
+        with ThreadPoolExecutor(max_workers=workers) as executor, tqdm(
+            total=total, desc="评估问题",
+            mininterval=0.5, miniters=max(1, (total or 0) // 200), smoothing=0
+        ) as pbar:
+            pending = set()
+            for row in rag_results:
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    all_results.extend(future.result() for future in done)
+                    pbar.update(len(done))
+                pending.add(executor.submit(evaluate_single_question_wrapper, row, config, cache))
+
+            for future in as_completed(pending):
+                all_results.append(future.result())
                 pbar.update(1)
 
     # 计算平均得分
     avg_score = (
-        sum(r["final_score"] for r in all_results) / len(all_results)
+        score_matrix(all_results)[:, SCORE_FIELDS.index("final_score")].mean()
         if all_results
         else 0
     )
@@ -352,17 +578,19 @@ def save_results(results: List[Dict], output_path: Path, config: Dict):
                 ]
             )
 
-        with open(output_path, "w", encoding="utf-8", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+        # restval/extrasaction 等价于逐行取 result.get(field, "")，无需为每行构建新的dict
+        with open(output_path, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames, restval="", extrasaction="ignore")
             writer.writeheader()
-
-            for result in results:
-                row = {field: result.get(field, "") for field in fieldnames}
-                writer.writerow(row)
+            writer.writerows(results)
 
     elif output_format == "json":
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            with open(output_path, "wb") as f:
+                f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+        else:
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
 
     print(f"{Colors.GREEN}✓ 评分结果已保存到: {output_path}{Colors.RESET}")
 
@@ -374,11 +602,13 @@ def print_summary(results: List[Dict]):
         return
 
     total = len(results)
-    avg_final_score = sum(r["final_score"] for r in results) / total
-    avg_source_score = sum(r["source_accuracy_score"] for r in results) / total
-    avg_content_score = sum(r["content_accuracy_score"] for r in results) / total
-    avg_completeness_score = sum(r["completeness_score"] for r in results) / total
-    avg_relevance_score = sum(r["relevance_score"] for r in results) / total
+    (
+        avg_source_score,
+        avg_content_score,
+        avg_completeness_score,
+        avg_relevance_score,
+        avg_final_score,
+    ) = score_matrix(results).mean(axis=0)
 
     print(f"\n{Colors.BLUE}{'=' * 60}{Colors.RESET}")
     print(f"{Colors.BLUE}评估摘要{Colors.RESET}")
@@ -410,8 +640,20 @@ def main():
         "-w",
         type=int,
         default=4,
-        help="并行评估的worker数量（默认：4）",
+        help="并行评估的worker数量，async 模式下为最大并发请求数（默认：4）",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["thread", "async"],
+        default="async",
+        help="并发方式：async 使用 AsyncOpenAI 单线程并发，thread 使用线程池（默认：async）",
     )
+    parser.add_argument(
+        "--cache-path",
+        default=str(JUDGE_CACHE_PATH),
+        help=f"评分缓存文件路径（默认：{JUDGE_CACHE_PATH}）",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="不使用评分缓存，所有问题重新调用判官模型")
     args = parser.parse_args()
 
     # 加载配置
@@ -423,7 +665,11 @@ def main():
     config = load_config(config_path)
 
     # 设置日志
-    logging.basicConfig(level=logging.INFO)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(levelname)s: %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
     logging.info("Starting judge evaluation process")
 
     # 解析输入文件路径
@@ -449,22 +695,32 @@ def main():
     print(f"Output file: {output_path}")
     print(f"LLM Model: {config['api']['model_id']}")
     print(f"Workers: {args.workers}")
+    print(f"Backend: {args.backend}")
+    print(f"Judge cache: {'Disabled' if args.no_cache else args.cache_path}")
     print(f"{Colors.BLUE}{'=' * 60}{Colors.RESET}\n")
 
     # 加载step4的结果
     print(f"{Colors.YELLOW}[1/2] Loading Step4 results...{Colors.RESET}")
-    rag_results = load_rag_results(input_path)
+    total = count_rag_results(input_path)
     print(
-        f"{Colors.GREEN}✓ Loaded {len(rag_results)} questions with agent answers{Colors.RESET}"
+        f"{Colors.GREEN}✓ Found {total} questions with agent answers{Colors.RESET}"
     )
 
-    if not rag_results:
+    if not total:
         print(f"{Colors.RED}没有数据，请检查输入文件{Colors.RESET}")
         return
 
     # 批量评估
     print(f"{Colors.YELLOW}[2/2] Evaluating questions...{Colors.RESET}")
-    results = evaluate_batch(rag_results, config, workers=args.workers)
+    cache = None if args.no_cache else JudgeCache(Path(args.cache_path), config["api"]["model_id"])
+    try:
+        results = evaluate_batch(
+            iter_rag_results(input_path), config,
+            workers=args.workers, backend=args.backend, total=total, cache=cache
+        )
+    finally:
+        if cache is not None:
+            cache.close()
 
     # 保存结果
     save_results(results, output_path, config)
@@ -4,9 +4,15 @@
 测试完整的pipeline：下载数据 -> RAG回答 -> 评分
 """
 
+import io
 import sys
+import pickle
+import asyncio
+import functools
+from types import MappingProxyType
 from pathlib import Path
 from datasets import load_dataset
+from huggingface_hub import HfApi
 import csv
 import yaml
 
@@ -14,14 +20,8 @@ import yaml
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from rag_agent import RAGAgent
-from step4_rag_answer import process_single_question
-from step5_judge_evaluation import (
-    evaluate_single_question,
-    build_judge_prompt,
-    call_llm,
-    parse_judge_response
-)
-import threading
+from step4_rag_answer import process_single_question_async
+from step5_judge_evaluation import evaluate_single_question
 
 
 class Colors:
@@ -33,69 +33,201 @@ class Colors:
     RESET = '\033[0m'
 
 
+# 测试用到的问题字段
+QUESTION_FIELDS = ['query', 'standard_answer', 'course', 'material', 'page_range', 'question_type']
+
+# 各split第一个问题的本地缓存目录，按数据集commit SHA失效
+FIRST_ROW_CACHE_DIR = Path.home() / ".cache" / "rag-benchmark"
+
+
+def freeze_config(value):
+    """把配置递归转换为只读结构（dict -> MappingProxyType，list -> tuple），仍可按字典方式读取"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze_config(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_config(item) for item in value)
+    return value
+
+
+@functools.lru_cache(maxsize=4)
 def load_config(config_path: Path):
-    """加载配置文件"""
+    """加载配置文件（按路径缓存解析结果；返回只读配置，所有split共享同一份）"""
     with open(config_path, 'r', encoding='utf-8') as f:
-        return yaml.safe_load(f)
+        return freeze_config(yaml.safe_load(f))
 
 
-def test_single_split(repo_id: str, split_name: str, agent: RAGAgent, config: dict):
-    """测试单个split的第一个问题"""
-    print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
-    print(f"{Colors.BLUE}Testing split: {split_name}{Colors.RESET}")
-    print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
+def load_cached_first_row(repo_id: str, split_name: str, revision: str = None):
+    """读取缓存的split第一个问题，缓存不存在或仓库/版本不一致时返回None
+
+    revision 为None（无法获取远程版本）时直接使用已有缓存
+    """
+    try:
+        with open(FIRST_ROW_CACHE_DIR / f"{split_name}.pkl", 'rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        # 文件不存在、被截断或不是本脚本写入的pickle，都视为未命中
+        return None
+
+    if not isinstance(cached, dict) or not isinstance(cached.get("question"), dict):
+        return None
+    if not all(field in cached["question"] for field in QUESTION_FIELDS):
+        return None
+    if cached.get("repo_id") != repo_id or (revision is not None and cached.get("revision") != revision):
+        return None
+    return cached["question"]
+
+
+def save_first_row(repo_id: str, split_name: str, revision: str, question_dict: dict):
+    """缓存split的第一个问题（约1KB），下次运行时跳过数据集下载"""
+    FIRST_ROW_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(FIRST_ROW_CACHE_DIR / f"{split_name}.pkl", 'wb') as f:
+        pickle.dump({"repo_id": repo_id, "revision": revision, "question": question_dict}, f)
+
+
+def load_test_datasets(repo_id: str, splits: list, revision: str = None) -> dict:
+    """加载要测试的split，返回 {split名称: 数据集}
+
+    优先以流式方式打开，测试时只拉取每个split的第一行；只有网络或流式读取出错时才退回完整下载，
+    split不存在时直接抛出 ValueError，不会为此下载整个数据集。
+    只保留测试用到的列，读取第一行时不解码其他列
+    """
+    try:
+        streamed = load_dataset(repo_id, revision=revision, streaming=True)
+    except (OSError, NotImplementedError) as e:
+        print(f"{Colors.YELLOW}⚠ Streaming unavailable ({e}), downloading full splits...{Colors.RESET}")
+    else:
+        missing_splits = [split_name for split_name in splits if split_name not in streamed]
+        if missing_splits:
+            raise ValueError(
+                f"Unknown split(s): {', '.join(missing_splits)}. Available: {', '.join(streamed)}"
+            )
+        return {split_name: streamed[split_name].select_columns(QUESTION_FIELDS) for split_name in splits}
+
+    datasets = load_dataset(repo_id, split=splits, revision=revision, download_mode="reuse_dataset_if_exists")
+    return {split_name: dataset.select_columns(QUESTION_FIELDS) for split_name, dataset in zip(splits, datasets)}
+
+
+def count_split_examples(dataset, split_name: str):
+    """从数据集元信息读取split的问题数，流式数据集无该信息时返回None"""
+    splits = dataset.info.splits
+    if splits and split_name in splits:
+        return splits[split_name].num_examples
+    return None
+
+
+async def test_single_split_async(
+    dataset_dict: dict,
+    split_name: str,
+    agent: RAGAgent,
+    config: dict,
+    semaphore: asyncio.Semaphore,
+    repo_id: str,
+    revision: str = None,
+    cached_question: dict = None
+):
+    """测试单个split的第一个问题
+
+    dataset_dict 为 main 中一次性打开的 {split名称: 数据集}（流式或完整下载）。
+    cached_question 为本地缓存的第一个问题，存在时不访问数据集；否则读取后写入缓存。
+    RAG回答和评分与 run_benchmark 走同一条代码路径（agent.answer_question 和
+    evaluate_single_question，放到线程中执行），semaphore 限制同时进行的LLM请求数。
+    输出先写入缓冲区，测试结束后整体打印，多个split并发时日志不会互相穿插
+    """
+    buffer = io.StringIO()
+
+    def log(message: str = ""):
+        buffer.write(message + "\n")
+
+    log(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
+    log(f"{Colors.BLUE}Testing split: {split_name}{Colors.RESET}")
+    log(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
 
     try:
-        # 1. 下载数据集
-        print(f"{Colors.YELLOW}[1/3] Downloading dataset...{Colors.RESET}")
-        dataset = load_dataset(repo_id, split=split_name)
-        print(f"{Colors.GREEN}✓ Downloaded {len(dataset)} questions{Colors.RESET}")
-
-        # 2. 获取第一个问题
-        first_question = dataset[0]
-        question_dict = {
-            'query': first_question['query'],
-            'standard_answer': first_question['standard_answer'],
-            'course': first_question['course'],
-            'material': first_question['material'],
-            'page_range': first_question['page_range'],
-            'question_type': first_question['question_type']
-        }
-
-        print(f"\n{Colors.CYAN}Question:{Colors.RESET}")
-        print(f"  {question_dict['query'][:100]}...")
-
-        # 3. 生成RAG回答
-        print(f"\n{Colors.YELLOW}[2/3] Generating RAG answer...{Colors.RESET}")
-        lock = threading.Lock()
-        result = process_single_question(agent, question_dict, lock)
+        # 1. 读取第一个问题（优先使用本地缓存，流式数据集只拉取这一行）
+        log(f"{Colors.YELLOW}[1/3] Loading first question...{Colors.RESET}")
+        if cached_question is not None:
+            question_dict = cached_question
+            log(f"{Colors.GREEN}✓ Loaded first question from cache{Colors.RESET}")
+        else:
+            dataset = dataset_dict[split_name]
+            first_question = await asyncio.to_thread(next, iter(dataset))
+            num_examples = count_split_examples(dataset, split_name)
+            if num_examples is not None:
+                log(f"{Colors.GREEN}✓ Loaded first of {num_examples} questions{Colors.RESET}")
+            else:
+                log(f"{Colors.GREEN}✓ Loaded first question{Colors.RESET}")
+
+            # 2. 整理问题字段并写入缓存
+            question_dict = {field: first_question[field] for field in QUESTION_FIELDS}
+            try:
+                save_first_row(repo_id, split_name, revision, question_dict)
+            except OSError as e:
+                log(f"{Colors.YELLOW}⚠ Failed to cache first question ({e}){Colors.RESET}")
+
+        log(f"\n{Colors.CYAN}Question:{Colors.RESET}")
+        log(f"  {question_dict['query'][:100]}...")
+
+        # 3. 生成RAG回答（与 run_benchmark 相同，在线程中调用学生实现的 agent.answer_question）
+        log(f"\n{Colors.YELLOW}[2/3] Generating RAG answer...{Colors.RESET}")
+        result = await process_single_question_async(agent, question_dict, semaphore)
 
         if result:
             agent_answer = result['agent_answer']
-            print(f"{Colors.GREEN}✓ RAG Answer generated{Colors.RESET}")
-            print(f"\n{Colors.CYAN}RAG Answer:{Colors.RESET}")
-            print(f"  {agent_answer[:200]}...")
+            log(f"{Colors.GREEN}✓ RAG Answer generated{Colors.RESET}")
+            log(f"\n{Colors.CYAN}RAG Answer:{Colors.RESET}")
+            log(f"  {agent_answer[:200]}...")
 
             # 4. 评分
-            print(f"\n{Colors.YELLOW}[3/3] Evaluating answer...{Colors.RESET}")
-            evaluation = evaluate_single_question(result, config)
-
-            print(f"{Colors.GREEN}✓ Evaluation completed{Colors.RESET}")
-            print(f"\n{Colors.CYAN}Scores:{Colors.RESET}")
-            print(f"  Source Accuracy: {evaluation['source_accuracy_score']:.2f}/10")
-            print(f"  Content Accuracy: {evaluation['content_accuracy_score']:.2f}/10")
-            print(f"  Completeness: {evaluation['completeness_score']:.2f}/10")
-            print(f"  Relevance: {evaluation['relevance_score']:.2f}/10")
-            print(f"  {Colors.GREEN}Final Score: {evaluation['final_score']:.2f}/10{Colors.RESET}")
+            log(f"\n{Colors.YELLOW}[3/3] Evaluating answer...{Colors.RESET}")
+            async with semaphore:
+                evaluation = await asyncio.to_thread(evaluate_single_question, result, config)
+
+            log(f"{Colors.GREEN}✓ Evaluation completed{Colors.RESET}")
+            log(f"\n{Colors.CYAN}Scores:{Colors.RESET}")
+            log(f"  Source Accuracy: {evaluation['source_accuracy_score']:.2f}/10")
+            log(f"  Content Accuracy: {evaluation['content_accuracy_score']:.2f}/10")
+            log(f"  Completeness: {evaluation['completeness_score']:.2f}/10")
+            log(f"  Relevance: {evaluation['relevance_score']:.2f}/10")
+            log(f"  {Colors.GREEN}Final Score: {evaluation['final_score']:.2f}/10{Colors.RESET}")
 
             return True
         else:
-            print(f"{Colors.RED}✗ Failed to generate RAG answer{Colors.RESET}")
+            log(f"{Colors.RED}✗ Failed to generate RAG answer{Colors.RESET}")
             return False
 
     except Exception as e:
-        print(f"{Colors.RED}✗ Error: {e}{Colors.RESET}")
+        log(f"{Colors.RED}✗ Error: {e}{Colors.RESET}")
         return False
+    finally:
+        print(buffer.getvalue(), end="", flush=True)
+
+
+async def run_split_tests(
+    dataset_dict: dict,
+    splits: list,
+    agent: RAGAgent,
+    config: dict,
+    repo_id: str,
+    revision: str = None,
+    cached_questions: dict = None
+) -> dict:
+    """并发测试所有split，返回 {split名称: 是否通过}
+
+    cached_questions 为 {split名称: 缓存的第一个问题}，命中的split不访问数据集。
+    同时进行的RAG/评分请求数不超过配置中的 judge_evaluation.workers（与 run_benchmark 一致）
+    """
+    cached_questions = cached_questions or {}
+    max_concurrency = config.get('judge_evaluation', {}).get('workers', 4)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    outcomes = await asyncio.gather(*(
+        test_single_split_async(
+            dataset_dict, split_name, agent, config, semaphore,
+            repo_id, revision, cached_questions.get(split_name)
+        )
+        for split_name in splits
+    ))
+    return dict(zip(splits, outcomes))
 
 
 def main():
@@ -156,15 +288,45 @@ def main():
 
     # 如果指定了split，只测试那个
     if args.split:
+        if args.split not in all_splits:
+            print(f"{Colors.RED}Invalid split name: {args.split}{Colors.RESET}")
+            print(f"Available splits: {', '.join(all_splits)}")
+            return
         splits_to_test = [args.split]
     else:
         splits_to_test = all_splits
 
-    # 测试每个split
-    results = {}
+    # 获取数据集当前的commit SHA，用于判断本地缓存的第一个问题是否过期
+    try:
+        revision = HfApi().dataset_info(repo_id).sha
+    except Exception as e:
+        print(f"{Colors.YELLOW}⚠ Failed to fetch dataset revision ({e}), reusing cached questions{Colors.RESET}")
+        revision = None
+
+    cached_questions = {}
     for split_name in splits_to_test:
-        success = test_single_split(repo_id, split_name, agent, config)
-        results[split_name] = success
+        question_dict = load_cached_first_row(repo_id, split_name, revision)
+        if question_dict is not None:
+            cached_questions[split_name] = question_dict
+    splits_to_load = [s for s in splits_to_test if s not in cached_questions]
+    if cached_questions:
+        print(f"{Colors.GREEN}✓ Using cached first question for {len(cached_questions)} splits{Colors.RESET}")
+
+    # 一次性打开所有未命中缓存的split，各split共用同一次仓库解析
+    dataset_dict = {}
+    if splits_to_load:
+        print(f"\n{Colors.YELLOW}Opening dataset...{Colors.RESET}")
+        try:
+            dataset_dict = load_test_datasets(repo_id, splits_to_load, revision)
+        except Exception as e:
+            print(f"{Colors.RED}✗ Failed to load dataset: {e}{Colors.RESET}")
+            return
+        print(f"{Colors.GREEN}✓ Opened {len(dataset_dict)} splits{Colors.RESET}")
+
+    # 并发测试每个split（各split相互独立，耗时主要在LLM调用）
+    results = asyncio.run(run_split_tests(
+        dataset_dict, splits_to_test, agent, config, repo_id, revision, cached_questions
+    ))
 
     # 总结
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
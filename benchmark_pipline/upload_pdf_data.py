@@ -4,9 +4,15 @@
 将 benchmark/pdf_data/ 下的PDF文件上传到 Hugging Face
 """
 
-from pathlib import Path
-from huggingface_hub import HfApi, create_repo
+import os
 import sys
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+from download_pdf_data import configure_hf_transfer, configure_http_session
+from huggingface_hub import CommitOperationAdd, HfApi
+
 
 class Colors:
     RED = '\033[31m'
@@ -21,9 +27,31 @@ class Colors:
 REPO_ID = "HEHUA2005/rag-benchmark-pdf-data"
 REPO_TYPE = "dataset"
 
+# 并行上传的线程数
+UPLOAD_WORKERS = 8
+
+
+def iter_pdf_files(root: Path):
+    """用两层 os.scandir 遍历 root/*/*.pdf，边遍历边产出 DirEntry"""
+    with os.scandir(root) as subdirs:
+        for subdir in subdirs:
+            if not subdir.is_dir():
+                continue
+            with os.scandir(subdir.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith('.pdf'):
+                        yield entry
+
+
+def preupload_file(api: HfApi, repo_id: str, local_path: str, path_in_repo: str) -> CommitOperationAdd:
+    """计算文件哈希并预上传文件内容，返回可用于commit的操作"""
+    operation = CommitOperationAdd(path_in_repo=path_in_repo, path_or_fileobj=local_path)
+    api.preupload_lfs_files(repo_id=repo_id, additions=[operation], repo_type=REPO_TYPE)
+    return operation
 
-def upload_pdf_data(pdf_data_dir: Path, repo_id: str):
-    """上传PDF数据到Hugging Face Hub"""
+
+def upload_pdf_data(pdf_data_dir: Path, repo_id: str, verbose: bool = False):
+    """上传PDF数据到Hugging Face Hub（verbose 为 True 时逐个打印上传成功的文件）"""
 
     if not pdf_data_dir.exists():
         print(f"{Colors.RED}PDF data directory not found: {pdf_data_dir}{Colors.RESET}")
@@ -42,7 +70,7 @@ def upload_pdf_data(pdf_data_dir: Path, repo_id: str):
     # 创建仓库（如果不存在）
     try:
         print(f"{Colors.YELLOW}Creating repository (if not exists)...{Colors.RESET}")
-        create_repo(
+        api.create_repo(
             repo_id=repo_id,
             repo_type=REPO_TYPE,
             exist_ok=True
@@ -52,59 +80,64 @@ def upload_pdf_data(pdf_data_dir: Path, repo_id: str):
         print(f"{Colors.RED}✗ Failed to create repository: {e}{Colors.RESET}")
         return False
 
-    # 收集所有PDF文件
-    pdf_files = list(pdf_data_dir.glob("*/*.pdf"))
-
-    if not pdf_files:
-        print(f"{Colors.YELLOW}No PDF files found in {pdf_data_dir}{Colors.RESET}")
-        return False
-
-    print(f"{Colors.CYAN}Found {len(pdf_files)} PDF files{Colors.RESET}\n")
-
-    # 上传每个PDF文件
-    success_count = 0
-    for pdf_file in pdf_files:
-        # 获取相对路径（保持目录结构）
-        relative_path = pdf_file.relative_to(pdf_data_dir)
-
-        print(f"{Colors.YELLOW}Uploading {relative_path}...{Colors.RESET}")
-
-        try:
-            api.upload_file(
-                path_or_fileobj=str(pdf_file),
-                path_in_repo=str(relative_path),
-                repo_id=repo_id,
-                repo_type=REPO_TYPE,
-            )
-            print(f"{Colors.GREEN}✓ Uploaded {relative_path}{Colors.RESET}")
-            success_count += 1
-        except Exception as e:
-            print(f"{Colors.RED}✗ Failed to upload {relative_path}: {e}{Colors.RESET}")
-
-    # 上传README
+    # 边遍历边提交预上传任务，文件发现与上传并行进行
+    operations = []
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        future_to_file = {}
+        for entry in iter_pdf_files(pdf_data_dir):
+            path_in_repo = os.path.relpath(entry.path, pdf_data_dir).replace(os.sep, '/')
+            future = executor.submit(preupload_file, api, repo_id, entry.path, path_in_repo)
+            future_to_file[future] = (path_in_repo, entry.stat().st_size)
+
+        if not future_to_file:
+            print(f"{Colors.YELLOW}No PDF files found in {pdf_data_dir}{Colors.RESET}")
+            return False
+
+        print(f"{Colors.CYAN}Found {len(future_to_file)} PDF files{Colors.RESET}\n")
+
+        with tqdm(total=len(future_to_file), desc="Uploading PDFs") as pbar:
+            for future in as_completed(future_to_file):
+                path_in_repo, file_size = future_to_file[future]
+                try:
+                    operations.append(future.result())
+                    if verbose:
+                        tqdm.write(f"{Colors.GREEN}✓ Uploaded {path_in_repo} ({file_size:,} bytes){Colors.RESET}")
+                except Exception as e:
+                    tqdm.write(f"{Colors.RED}✗ Failed to upload {path_in_repo}: {e}{Colors.RESET}")
+                pbar.update(1)
+
+    total_count = len(future_to_file)
+    pdf_count = len(operations)
+
+    # 在一次commit中提交所有上传成功的PDF文件和README
     readme_file = pdf_data_dir / "README.md"
     if readme_file.exists():
-        print(f"\n{Colors.YELLOW}Uploading README.md...{Colors.RESET}")
+        operations.append(CommitOperationAdd(path_in_repo="README.md", path_or_fileobj=str(readme_file)))
+
+    success_count = 0
+    if pdf_count:
+        print(f"\n{Colors.YELLOW}Committing {pdf_count} PDF files...{Colors.RESET}")
         try:
-            api.upload_file(
-                path_or_fileobj=str(readme_file),
-                path_in_repo="README.md",
+            api.create_commit(
                 repo_id=repo_id,
                 repo_type=REPO_TYPE,
+                operations=operations,
+                commit_message=f"Upload {pdf_count} PDF files",
             )
-            print(f"{Colors.GREEN}✓ Uploaded README.md{Colors.RESET}")
+            print(f"{Colors.GREEN}✓ Committed {pdf_count} PDF files{Colors.RESET}")
+            success_count = pdf_count
         except Exception as e:
-            print(f"{Colors.YELLOW}⚠ Failed to upload README.md: {e}{Colors.RESET}")
+            print(f"{Colors.RED}✗ Failed to commit PDF files: {e}{Colors.RESET}")
 
     # 总结
     print(f"\n{Colors.BLUE}{'='*60}{Colors.RESET}")
     print(f"{Colors.BLUE}Upload Summary{Colors.RESET}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}")
-    print(f"Successfully uploaded: {success_count}/{len(pdf_files)} files")
+    print(f"Successfully uploaded: {success_count}/{total_count} files")
     print(f"Repository URL: https://huggingface.co/datasets/{repo_id}")
     print(f"{Colors.BLUE}{'='*60}{Colors.RESET}\n")
 
-    return success_count == len(pdf_files)
+    return success_count == total_count
 
 
 def main():
@@ -116,9 +149,24 @@ def main():
         type=str,
         help="Path to PDF data directory (default: ../benchmark/pdf_data)"
     )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="Print every uploaded file"
+    )
+    parser.add_argument(
+        "--hf-transfer",
+        action=argparse.BooleanOptionalAction,
+        default=None,
+        help="Use hf_transfer for multi-connection uploads (default: enabled if installed)"
+    )
 
     args = parser.parse_args()
 
+    configure_http_session()
+    configure_hf_transfer(args.hf_transfer)
+
     # 确定PDF数据目录
     if args.pdf_dir:
         pdf_data_dir = Path(args.pdf_dir)
@@ -128,7 +176,7 @@ def main():
         pdf_data_dir = script_dir.parent / "benchmark" / "pdf_data"
 
     # 上传
-    success = upload_pdf_data(pdf_data_dir, REPO_ID)
+    success = upload_pdf_data(pdf_data_dir, REPO_ID, verbose=args.verbose)
 
     if success:
         print(f"{Colors.GREEN}All files uploaded successfully!{Colors.RESET}")
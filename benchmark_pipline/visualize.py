@@ -3,16 +3,29 @@
 可视化模块：生成评分结果的可视化图表
 """
 
-import csv
+import hashlib
 from pathlib import Path
-from typing import List, Dict
 import matplotlib.pyplot as plt
 import matplotlib
+from matplotlib import font_manager
 import numpy as np
+import pandas as pd
 
 # 设置matplotlib使用非交互式后端
 matplotlib.use('Agg')
 
+
+def warm_up_matplotlib():
+    """固定字体并预先加载字体缓存和Agg后端，首次保存图表时不再扫描和匹配字体
+
+    会修改全局 rcParams，只在绘图进程的 init_plot_worker 中调用，不在导入时执行
+    """
+    matplotlib.rcParams['font.family'] = 'DejaVu Sans'
+    matplotlib.rcParams['text.usetex'] = False
+    font_manager.fontManager.findfont('DejaVu Sans')
+    plt.close(plt.figure())
+
+
 class Colors:
     RED = "\033[31m"
     GREEN = "\033[32m"
@@ -22,95 +35,138 @@ class Colors:
     RESET = "\033[0m"
 
 
-def load_evaluation_results(input_path: Path) -> List[Dict]:
-    """加载评分结果"""
-    results = []
-    with open(input_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            result = dict(row)
-            for key in ['final_score', 'source_accuracy_score', 'content_accuracy_score',
-                       'completeness_score', 'relevance_score']:
-                if key in result:
-                    result[key] = float(result[key])
-            results.append(result)
-    return results
-
-
-def create_visualizations(results: List[Dict], output_dir: Path, split_name: str = None):
-    """生成评分可视化图表"""
-    if not results:
-        print(f"{Colors.YELLOW}没有数据可供可视化{Colors.RESET}")
-        return
+# 评分列，顺序即评分矩阵的列顺序
+SCORE_COLUMNS = ['source_accuracy_score', 'content_accuracy_score', 'completeness_score',
+                 'relevance_score', 'final_score']
 
-    print(f"\n{Colors.YELLOW}生成可视化图表...{Colors.RESET}")
-    output_dir.mkdir(parents=True, exist_ok=True)
+# 评分列按float32解析，直接得到连续的数值数组
+SCORE_DTYPES = {column: 'float32' for column in SCORE_COLUMNS}
 
-    final_scores = [r["final_score"] for r in results]
-    source_scores = [r["source_accuracy_score"] for r in results]
-    content_scores = [r["content_accuracy_score"] for r in results]
-    completeness_scores = [r["completeness_score"] for r in results]
-    relevance_scores = [r["relevance_score"] for r in results]
 
-    avg_scores = {
-        'Source Accuracy\n(60%)': np.mean(source_scores),
-        'Content Accuracy\n(20%)': np.mean(content_scores),
-        'Completeness\n(15%)': np.mean(completeness_scores),
-        'Relevance\n(5%)': np.mean(relevance_scores),
-        'Final Score': np.mean(final_scores)
-    }
+def load_evaluation_results(input_path: Path) -> pd.DataFrame:
+    """加载评分结果
 
-    # 文件名前缀
-    prefix = f"{split_name}_" if split_name else ""
+    只读取五个评分列（由pandas在C层解析为float32），问题、回答和评分理由等长文本列
+    不会被构造成Python字符串
+    """
+    return pd.read_csv(input_path, encoding='utf-8', usecols=list(SCORE_DTYPES), dtype=SCORE_DTYPES)
+
+
+# 柱状图和箱线图中各维度使用的颜色
+DIMENSION_COLORS = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
+
+# 各输出格式的保存参数：图表是中间产物，PNG使用最低压缩级别且不写入Software等文本块，
+# WebP使用最快的无损编码
+SAVE_KWARGS = {
+    'png': {'metadata': {'Software': None}, 'pil_kwargs': {'compress_level': 1}},
+    'webp': {'pil_kwargs': {'lossless': True, 'method': 0}},
+}
+
+# 支持的输出格式
+IMAGE_FORMATS = tuple(SAVE_KWARGS)
+
+# 来源准确性、内容准确性、完整性、相关性在最终得分中的权重
+DIMENSION_WEIGHTS = np.array([0.6, 0.2, 0.15, 0.05])
+
+# 最终得分直方图的分箱数和分数范围
+HISTOGRAM_BINS = 20
+SCORE_RANGE = (0, 10)
+
+# 默认输出分辨率（屏幕查看足够清晰）
+DEFAULT_DPI = 120
+
+
+def init_plot_worker():
+    """绘图进程初始化：使用非交互式后端和预热过的字体，并合并几乎共线的路径顶点以减少绘制量"""
+    matplotlib.use('Agg')
+    warm_up_matplotlib()
+    matplotlib.rcParams['path.simplify_threshold'] = 1.0
+
+
+def resolve_image_format(image_format: str) -> str:
+    """检查输出格式是否可用，Pillow不支持WebP时退回PNG，不支持的格式抛出 ValueError"""
+    if image_format not in SAVE_KWARGS:
+        raise ValueError(f"不支持的图表格式: {image_format}（可选: {', '.join(IMAGE_FORMATS)}）")
+    if image_format == 'webp':
+        from PIL import features
+        if not features.check('webp'):
+            print(f"{Colors.YELLOW}⚠ Pillow 未启用 WebP 支持，改为输出 PNG{Colors.RESET}")
+            return 'png'
+    return image_format
+
+
+def chart_title(title: str, split_name: str = None) -> str:
+    """图表标题，指定split时在第二行标注"""
+    if split_name:
+        title += f'\n({split_name})'
+    return title
+
+
+# 进程内按尺寸缓存的Figure，同尺寸的图表复用同一块画布
+# （run_benchmark 的绘图进程常驻整个运行过程，依次绘制多个split时每种尺寸只创建一次）
+FIGURE_CACHE = {}
+
+
+def get_figure(figsize: tuple, projection: str = None):
+    """取得指定尺寸的空白图表，返回 (fig, ax)
+
+    同一进程内相同尺寸的图表复用已创建的Figure，只清空内容，避免反复创建和销毁画布
+    """
+    fig = FIGURE_CACHE.get(figsize)
+    if fig is None:
+        fig = plt.figure(figsize=figsize)
+        FIGURE_CACHE[figsize] = fig
+    else:
+        fig.clf()
+    return fig, fig.add_subplot(projection=projection)
 
-    # 1. 平均分柱状图
-    fig, ax = plt.subplots(figsize=(12, 6))
-    colors = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A', '#98D8C8']
-    bars = ax.bar(range(len(avg_scores)), list(avg_scores.values()), color=colors, alpha=0.8, edgecolor='black')
+
+def save_figure(fig, output_path: Path, dpi: int = DEFAULT_DPI):
+    """保存图表（由 tight_layout 预留标题和标签的空间，不再用 bbox_inches='tight' 额外绘制一遍）
+
+    Figure 留在 FIGURE_CACHE 中供下一张同尺寸的图表复用，不关闭
+    """
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=dpi, backend='agg', **SAVE_KWARGS[output_path.suffix[1:]])
+
+
+def plot_average_scores(avg_scores: dict, output_path: Path, split_name: str = None, dpi: int = DEFAULT_DPI):
+    """1. 平均分柱状图"""
+    fig, ax = get_figure((12, 6))
+    bars = ax.bar(range(len(avg_scores)), list(avg_scores.values()), color=DIMENSION_COLORS, alpha=0.8, edgecolor='black')
     ax.set_xticks(range(len(avg_scores)))
     ax.set_xticklabels(list(avg_scores.keys()), fontsize=11)
     ax.set_ylabel('Average Score', fontsize=12)
-    title = f'RAG System Evaluation - Average Scores by Dimension'
-    if split_name:
-        title += f'\n({split_name})'
-    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_title(chart_title('RAG System Evaluation - Average Scores by Dimension', split_name), fontsize=14, fontweight='bold')
     ax.set_ylim(0, 10)
     ax.grid(axis='y', alpha=0.3, linestyle='--')
     for bar in bars:
         height = bar.get_height()
         ax.text(bar.get_x() + bar.get_width()/2., height, f'{height:.2f}',
                 ha='center', va='bottom', fontsize=10, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(output_dir / f'{prefix}average_scores.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"{Colors.GREEN}  ✓ 平均分柱状图: {output_dir / f'{prefix}average_scores.png'}{Colors.RESET}")
-
-    # 2. 分数分布箱线图
-    fig, ax = plt.subplots(figsize=(12, 6))
-    box_data = [source_scores, content_scores, completeness_scores, relevance_scores, final_scores]
+    save_figure(fig, output_path, dpi)
+
+
+def plot_score_distribution(box_data: list, output_path: Path, split_name: str = None, dpi: int = DEFAULT_DPI):
+    """2. 分数分布箱线图"""
+    fig, ax = get_figure((12, 6))
     bp = ax.boxplot(box_data, labels=['Source Accuracy\n(60%)', 'Content Accuracy\n(20%)', 'Completeness\n(15%)', 'Relevance\n(5%)', 'Final Score'],
                     patch_artist=True, showmeans=True)
-    for patch, color in zip(bp['boxes'], colors):
-        patch.set_facecolor(color)
-        patch.set_alpha(0.6)
+    # 每个箱体一次 set 调用同时设置颜色和透明度
+    for patch, color in zip(bp['boxes'], DIMENSION_COLORS):
+        patch.set(facecolor=color, alpha=0.6)
     ax.set_ylabel('Score', fontsize=12)
-    title = 'RAG System Evaluation - Score Distribution'
-    if split_name:
-        title += f'\n({split_name})'
-    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_title(chart_title('RAG System Evaluation - Score Distribution', split_name), fontsize=14, fontweight='bold')
     ax.set_ylim(0, 10)
     ax.grid(axis='y', alpha=0.3, linestyle='--')
-    plt.tight_layout()
-    plt.savefig(output_dir / f'{prefix}score_distribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"{Colors.GREEN}  ✓ 分数分布箱线图: {output_dir / f'{prefix}score_distribution.png'}{Colors.RESET}")
+    save_figure(fig, output_path, dpi)
 
-    # 3. 雷达图
-    fig, ax = plt.subplots(figsize=(8, 8), subplot_kw=dict(projection='polar'))
+
+def plot_radar_chart(values: list, output_path: Path, split_name: str = None, dpi: int = DEFAULT_DPI):
+    """3. 雷达图"""
+    fig, ax = get_figure((8, 8), projection='polar')
     categories = ['Source Accuracy', 'Content Accuracy', 'Completeness', 'Relevance']
-    values = [np.mean(source_scores), np.mean(content_scores),
-              np.mean(completeness_scores), np.mean(relevance_scores)]
-    values += values[:1]
+    values = list(values) + list(values[:1])
     angles = np.linspace(0, 2 * np.pi, len(categories), endpoint=False).tolist()
     angles += angles[:1]
     ax.plot(angles, values, 'o-', linewidth=2, color='#4ECDC4')
@@ -118,67 +174,49 @@ def create_visualizations(results: List[Dict], output_dir: Path, split_name: str
     ax.set_xticks(angles[:-1])
     ax.set_xticklabels(categories, fontsize=11)
     ax.set_ylim(0, 10)
-    title = 'RAG System Evaluation - Radar Chart'
-    if split_name:
-        title += f'\n({split_name})'
-    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    ax.set_title(chart_title('RAG System Evaluation - Radar Chart', split_name), fontsize=14, fontweight='bold', pad=20)
     ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.savefig(output_dir / f'{prefix}radar_chart.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"{Colors.GREEN}  ✓ 雷达图: {output_dir / f'{prefix}radar_chart.png'}{Colors.RESET}")
-
-    # 4. 最终得分分布直方图
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.hist(final_scores, bins=20, color='#98D8C8', alpha=0.7, edgecolor='black')
-    ax.axvline(np.mean(final_scores), color='red', linestyle='--', linewidth=2, label=f'Average: {np.mean(final_scores):.2f}')
+    save_figure(fig, output_path, dpi)
+
+
+def plot_final_score_histogram(final_scores: np.ndarray, final_mean: float, output_path: Path, split_name: str = None, dpi: int = DEFAULT_DPI):
+    """4. 最终得分分布直方图"""
+    fig, ax = get_figure((10, 6))
+    # 分数固定在0-10之间，指定range后numpy按等宽分箱直接计算，无需扫描最值
+    counts, edges = np.histogram(final_scores, bins=HISTOGRAM_BINS, range=SCORE_RANGE)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='#98D8C8', alpha=0.7, edgecolor='black')
+    ax.axvline(final_mean, color='red', linestyle='--', linewidth=2, label=f'Average: {final_mean:.2f}')
     ax.set_xlabel('Final Score', fontsize=12)
     ax.set_ylabel('Number of Questions', fontsize=12)
-    title = 'RAG System Evaluation - Final Score Distribution'
-    if split_name:
-        title += f'\n({split_name})'
-    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.set_title(chart_title('RAG System Evaluation - Final Score Distribution', split_name), fontsize=14, fontweight='bold')
     ax.legend(fontsize=11)
     ax.grid(axis='y', alpha=0.3, linestyle='--')
-    plt.tight_layout()
-    plt.savefig(output_dir / f'{prefix}final_score_histogram.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"{Colors.GREEN}  ✓ 最终得分分布图: {output_dir / f'{prefix}final_score_histogram.png'}{Colors.RESET}")
-
-    # 5. 综合对比图（如果问题数量合适）
-    if len(results) <= 100:  # 只在问题数量不太多时生成
-        fig, ax = plt.subplots(figsize=(14, 6))
-        x = np.arange(len(results))
-        width = 0.2
-        ax.bar(x - 1.5*width, source_scores, width, label='Source Accuracy', color='#FF6B6B', alpha=0.8)
-        ax.bar(x - 0.5*width, content_scores, width, label='Content Accuracy', color='#4ECDC4', alpha=0.8)
-        ax.bar(x + 0.5*width, completeness_scores, width, label='Completeness', color='#45B7D1', alpha=0.8)
-        ax.bar(x + 1.5*width, relevance_scores, width, label='Relevance', color='#FFA07A', alpha=0.8)
-        ax.set_xlabel('Question Index', fontsize=12)
-        ax.set_ylabel('Score', fontsize=12)
-        title = 'RAG System Evaluation - Scores Comparison by Question'
-        if split_name:
-            title += f'\n({split_name})'
-        ax.set_title(title, fontsize=14, fontweight='bold')
-        ax.set_ylim(0, 10)
-        ax.legend(fontsize=10)
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-        if len(results) > 20:
-            ax.set_xticks(x[::max(1, len(results)//20)])
-            ax.set_xticklabels(x[::max(1, len(results)//20)])
-        plt.tight_layout()
-        plt.savefig(output_dir / f'{prefix}all_questions_comparison.png', dpi=300, bbox_inches='tight')
-        plt.close()
-        print(f"{Colors.GREEN}  ✓ 所有问题对比图: {output_dir / f'{prefix}all_questions_comparison.png'}{Colors.RESET}")
-
-    # 6. 权重贡献分析图
-    fig, ax = plt.subplots(figsize=(10, 10))
-    contributions = {
-        'Source Accuracy': np.mean(source_scores) * 0.6,
-        'Content Accuracy': np.mean(content_scores) * 0.2,
-        'Completeness': np.mean(completeness_scores) * 0.15,
-        'Relevance': np.mean(relevance_scores) * 0.05
-    }
+    save_figure(fig, output_path, dpi)
+
+
+def plot_questions_comparison(scores: np.ndarray, output_path: Path, split_name: str = None, dpi: int = DEFAULT_DPI):
+    """5. 综合对比热力图（scores 为 (问题数, 4) 的来源/内容/完整性/相关性得分）
+
+    每个问题一列、每个维度一行，整张图只有一个图像对象
+    """
+    num_questions = len(scores)
+    fig, ax = get_figure((14, 6))
+    image = ax.imshow(scores.T, aspect='auto', cmap='RdYlGn', vmin=0, vmax=10, interpolation='nearest')
+    fig.colorbar(image, ax=ax, label='Score')
+    ax.set_yticks(range(4))
+    ax.set_yticklabels(['Source Accuracy', 'Content Accuracy', 'Completeness', 'Relevance'], fontsize=11)
+    ax.set_xlabel('Question Index', fontsize=12)
+    ax.set_title(chart_title('RAG System Evaluation - Scores Comparison by Question', split_name), fontsize=14, fontweight='bold')
+    x = np.arange(num_questions)
+    step = max(1, num_questions//20)
+    ax.set_xticks(x[::step])
+    ax.set_xticklabels(x[::step])
+    save_figure(fig, output_path, dpi)
+
+
+def plot_weight_contribution(contributions: dict, output_path: Path, split_name: str = None, dpi: int = DEFAULT_DPI):
+    """6. 权重贡献分析图"""
+    fig, ax = get_figure((10, 10))
     labels = list(contributions.keys())
     values = list(contributions.values())
     colors_pie = ['#FF6B6B', '#4ECDC4', '#45B7D1', '#FFA07A']
@@ -187,19 +225,162 @@ def create_visualizations(results: List[Dict], output_dir: Path, split_name: str
     for autotext in autotexts:
         autotext.set_color('white')
         autotext.set_fontweight('bold')
-    title = 'RAG System Evaluation - Weight Contribution'
-    if split_name:
-        title += f'\n({split_name})'
-    ax.set_title(title, fontsize=14, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(output_dir / f'{prefix}weight_contribution.png', dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"{Colors.GREEN}  ✓ 权重贡献分析图: {output_dir / f'{prefix}weight_contribution.png'}{Colors.RESET}")
+    ax.set_title(chart_title('RAG System Evaluation - Weight Contribution', split_name), fontsize=14, fontweight='bold')
+    save_figure(fig, output_path, dpi)
+
+
+def create_visualizations(
+    df: pd.DataFrame,
+    output_dir: Path,
+    split_name: str = None,
+    dpi: int = DEFAULT_DPI,
+    image_format: str = 'png',
+    content_hash: str = None
+):
+    """生成评分可视化图表
+
+    在当前进程中依次绘制各图表（run_benchmark 中即常驻的绘图进程）。
+    提供 content_hash（评分结果的哈希）时记录在输出目录的标记文件中，
+    输入、分辨率和格式都未变化且图表齐全时直接跳过
+    """
+    if df.empty:
+        print(f"{Colors.YELLOW}没有数据可供可视化{Colors.RESET}")
+        return
+
+    print(f"\n{Colors.YELLOW}生成可视化图表...{Colors.RESET}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # (问题数, 5) 的评分矩阵，一次求出各维度平均分，后续图表直接复用
+    scores = df[SCORE_COLUMNS].to_numpy()
+    means = scores.mean(axis=0)
+    source_mean, content_mean, completeness_mean, relevance_mean, final_mean = means
+
+    avg_scores = {
+        'Source Accuracy\n(60%)': source_mean,
+        'Content Accuracy\n(20%)': content_mean,
+        'Completeness\n(15%)': completeness_mean,
+        'Relevance\n(5%)': relevance_mean,
+        'Final Score': final_mean
+    }
+    # 四个维度平均分乘以各自权重，得到对最终得分的贡献
+    contributions = dict(zip(
+        ['Source Accuracy', 'Content Accuracy', 'Completeness', 'Relevance'],
+        means[:4] * DIMENSION_WEIGHTS
+    ))
+
+    # 文件名前缀和扩展名
+    prefix = f"{split_name}_" if split_name else ""
+    ext = resolve_image_format(image_format)
+
+    # (描述, 输出文件, 绘图函数, 参数)
+    charts = [
+        ('平均分柱状图', f'{prefix}average_scores.{ext}', plot_average_scores, (avg_scores,)),
+        ('分数分布箱线图', f'{prefix}score_distribution.{ext}', plot_score_distribution, (list(scores.T),)),
+        ('雷达图', f'{prefix}radar_chart.{ext}', plot_radar_chart,
+         ([source_mean, content_mean, completeness_mean, relevance_mean],)),
+        ('最终得分分布图', f'{prefix}final_score_histogram.{ext}', plot_final_score_histogram,
+         (scores[:, 4], final_mean)),
+    ]
+    # 综合对比图只在问题数量不太多时生成
+    if len(scores) <= 100:
+        charts.append(('所有问题对比图', f'{prefix}all_questions_comparison.{ext}', plot_questions_comparison,
+                       (scores[:, :4],)))
+    charts.append(('权重贡献分析图', f'{prefix}weight_contribution.{ext}', plot_weight_contribution, (contributions,)))
+
+    # 输入未变化且图表齐全时跳过绘制
+    hash_file = output_dir / f".{prefix}charts.hash"
+    render_key = f"{content_hash}|{dpi}|{ext}" if content_hash else None
+    if (render_key and hash_file.exists() and hash_file.read_text() == render_key
+            and all((output_dir / filename).exists() for _, filename, _, _ in charts)):
+        print(f"{Colors.GREEN}✓ 评分结果未变化，沿用已有图表: {output_dir}{Colors.RESET}")
+        return
+
+    # 在当前进程中依次绘制：每张图只需几十毫秒，为此再启动绘图进程得不偿失；
+    # 多个split之间的并行由调用方（如 run_benchmark 的可视化进程池）负责
+    for description, filename, plot, args in charts:
+        plot(*args, output_dir / filename, split_name, dpi)
+        print(f"{Colors.GREEN}  ✓ {description}: {output_dir / filename}{Colors.RESET}")
+
+    if render_key:
+        hash_file.write_text(render_key)
 
     print(f"{Colors.GREEN}✓ 所有可视化图表已保存到: {output_dir}{Colors.RESET}")
 
 
-def visualize_results(csv_file: Path, output_dir: Path = None, split_name: str = None):
+def as_score_matrix(results) -> np.ndarray:
+    """把评估结果列表（或已有的评分数组）转换为 (问题数, 5) 的float32评分矩阵，列顺序与 SCORE_COLUMNS 相同"""
+    if isinstance(results, np.ndarray):
+        return results.astype(np.float32, copy=False)
+    return np.array([[r[column] for column in SCORE_COLUMNS] for r in results], dtype=np.float32).reshape(-1, len(SCORE_COLUMNS))
+
+
+def create_multi_split_visualizations(
+    results_by_split: dict,
+    output_dir: Path,
+    dpi: int = DEFAULT_DPI,
+    image_format: str = 'png'
+):
+    """在一张网格图中对比所有split
+
+    results_by_split 为 {split名称: 评估结果列表或 (问题数, 5) 评分数组}。
+    每个split一行：各维度平均分、分数分布箱线图、最终得分直方图，
+    所有split共用坐标范围、颜色和直方图分箱，便于横向比较
+    """
+    scores_by_split = {
+        split_name: as_score_matrix(results)
+        for split_name, results in results_by_split.items()
+    }
+    scores_by_split = {name: scores for name, scores in scores_by_split.items() if len(scores)}
+    if not scores_by_split:
+        print(f"{Colors.YELLOW}没有数据可供可视化{Colors.RESET}")
+        return
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f'all_splits_comparison.{resolve_image_format(image_format)}'
+
+    labels = ['Source', 'Content', 'Completeness', 'Relevance', 'Final']
+    edges = np.linspace(*SCORE_RANGE, HISTOGRAM_BINS + 1)
+
+    fig = plt.figure(figsize=(18, 4 * len(scores_by_split)))
+    axes = fig.subplots(len(scores_by_split), 3, squeeze=False)
+    for row, (split_name, scores) in zip(axes, scores_by_split.items()):
+        bar_ax, box_ax, hist_ax = row
+        means = scores.mean(axis=0)
+
+        bars = bar_ax.bar(labels, means, color=DIMENSION_COLORS, alpha=0.8, edgecolor='black')
+        bar_ax.bar_label(bars, fmt='%.2f', fontsize=9)
+        bar_ax.set_ylim(*SCORE_RANGE)
+        bar_ax.set_ylabel(split_name, fontsize=9)
+        bar_ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+        bp = box_ax.boxplot(list(scores.T), labels=labels, patch_artist=True, showmeans=True)
+        for patch, color in zip(bp['boxes'], DIMENSION_COLORS):
+            patch.set(facecolor=color, alpha=0.6)
+        box_ax.set_ylim(*SCORE_RANGE)
+        box_ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+        counts, _ = np.histogram(scores[:, 4], bins=edges)
+        hist_ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='#98D8C8', alpha=0.7, edgecolor='black')
+        hist_ax.axvline(means[4], color='red', linestyle='--', linewidth=2, label=f'Average: {means[4]:.2f}')
+        hist_ax.legend(fontsize=9)
+        hist_ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+    for ax, title in zip(axes[0], ['Average Scores by Dimension', 'Score Distribution', 'Final Score Distribution']):
+        ax.set_title(title, fontsize=13, fontweight='bold')
+    fig.suptitle('RAG System Evaluation - All Splits', fontsize=15, fontweight='bold')
+
+    save_figure(fig, output_path, dpi)
+    plt.close(fig)
+    print(f"{Colors.GREEN}✓ 所有split对比图: {output_path}{Colors.RESET}")
+
+
+def visualize_results(
+    csv_file: Path,
+    output_dir: Path = None,
+    split_name: str = None,
+    dpi: int = DEFAULT_DPI,
+    image_format: str = 'png'
+):
     """
     为评分结果生成可视化图表
 
@@ -207,6 +388,8 @@ def visualize_results(csv_file: Path, output_dir: Path = None, split_name: str =
         csv_file: 评分结果CSV文件路径
         output_dir: 可视化图表输出目录（默认为CSV文件同目录下的visualizations子目录）
         split_name: split名称（用于图表标题）
+        dpi: 图表输出分辨率
+        image_format: 图表格式，png 或 webp（需要Pillow支持WebP）
     """
     if not csv_file.exists():
         print(f"{Colors.RED}评分结果文件不存在: {csv_file}{Colors.RESET}")
@@ -216,12 +399,58 @@ def visualize_results(csv_file: Path, output_dir: Path = None, split_name: str =
         output_dir = csv_file.parent / "visualizations"
 
     try:
-        results = load_evaluation_results(csv_file)
-        if results:
-            create_visualizations(results, output_dir, split_name)
+        content_hash = hashlib.blake2b(csv_file.read_bytes(), digest_size=8).hexdigest()
+        df = load_evaluation_results(csv_file)
+        if not df.empty:
+            create_visualizations(df, output_dir, split_name, dpi, image_format, content_hash)
         else:
             print(f"{Colors.YELLOW}没有数据可供可视化{Colors.RESET}")
     except Exception as e:
         print(f"{Colors.RED}生成可视化图表失败: {e}{Colors.RESET}")
         import traceback
         traceback.print_exc()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate charts for evaluation result CSV files")
+    parser.add_argument(
+        "csv_files",
+        type=str,
+        nargs="+",
+        help="Evaluation result CSV files (split name is taken from the file name)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        "-o",
+        type=str,
+        help="Output directory; charts go to <output-dir>/<split> (default: visualizations/ next to each CSV)"
+    )
+    parser.add_argument(
+        "--dpi",
+        type=int,
+        default=DEFAULT_DPI,
+        help=f"Output resolution (default: {DEFAULT_DPI})"
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        choices=IMAGE_FORMATS,
+        default='png',
+        help="Image format (default: png; webp requires Pillow with WebP support)"
+    )
+
+    args = parser.parse_args()
+
+    # 当前进程即绘图进程
+    init_plot_worker()
+
+    for csv_file in map(Path, args.csv_files):
+        split_name = csv_file.stem
+        output_dir = Path(args.output_dir) / split_name if args.output_dir else None
+        visualize_results(csv_file, output_dir, split_name, args.dpi, args.format)
+
+
+if __name__ == "__main__":
+    main()